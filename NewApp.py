@@ -1,10 +1,9 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, session
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, session, jsonify
 import os
 import subprocess
 import uuid
+import sqlite3
 import time
-import pandas as pd
-import matplotlib.pyplot as plt
 import io
 import base64
 from werkzeug.utils import secure_filename
@@ -12,7 +11,19 @@ from werkzeug.utils import secure_filename
 # Import functionality from your scripts
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from commentbuilder2 import get_documents_for_docket, get_comments_for_document, get_comment_details, save_comments_to_csv
+from newcommentbuilder import get_comments_for_docket, save_comments_to_csv, has_checkpoint, resume_harvest, get_search_index
+from ingest import ingest_export
+from delta_sync import valid_docket_id
+from results_store import write_results, load_results, load_summary, read_rows
+from results_index import query_positions, MAX_PAGE_SIZE
+from charts import CHARTS, get_chart
+from jobs import JobManager, QueueFull, SUCCEEDED, FAILED, CANCELLED
+import metrics
+from model_registry import ModelRegistry
+from rule_cache import RuleFeatureCache
+from result_cache import ClassificationCache
+from attachment_cache import file_sha256
+from classification import classify_docket, STREAMING_MIN_ROWS
 import cc2
 # Import the TextFeatureExtractor class directly to make it available in main namespace
 from cc2 import TextFeatureExtractor
@@ -22,12 +33,30 @@ app = Flask(__name__)
 app.secret_key = os.urandom(24)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
+app.config['MAX_CONTENT_LENGTH'] = 512 * 1024 * 1024  # 512MB max upload size (comment exports can be large)
+
+app.config['JOB_WORKERS'] = 2  # harvests/classifications running at once
+app.config['JOB_QUEUE_LIMIT'] = 10  # jobs allowed to wait for a worker
+app.config['DEDUPLICATE_COMMENTS'] = True  # classify form letters once per near-duplicate cluster
 
 # Ensure upload and output directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 
+# Long-running fetch and classify work runs here instead of inside the request.
+# Jobs are held in memory, so run the app as a single (threaded) process.
+JOBS = JobManager(max_workers=app.config['JOB_WORKERS'], max_queued=app.config['JOB_QUEUE_LIMIT'])
+metrics.JOBS_ACTIVE.set_function(JOBS.active_count)
+metrics.register_metrics_endpoint(app)
+
+# The classifier is loaded (or trained) once per server process: at startup
+# under `python NewApp.py`, otherwise on the first request. Not at import time,
+# since spawned attachment and classification workers re-import this script
+# as __mp_main__ and would each load (or train) their own copy.
+MODELS = ModelRegistry(cc2.SubstantiveCommentClassifier)
+RULE_CACHE = RuleFeatureCache()
+RESULT_CACHE = ClassificationCache()
+
 
 @app.route('/')
 def index():
@@ -36,14 +65,83 @@ def index():
     return render_template('index.html')
 
 
+def wants_json():
+    """True when the client (the polling JS) asked for a JSON response"""
+    return request.accept_mimetypes.best == 'application/json'
+
+
+def reject(message, endpoint):
+    """Report a bad request as JSON or as a flash message and redirect"""
+    if wants_json():
+        return jsonify({'error': message}), 400
+    flash(message, 'error')
+    return redirect(url_for(endpoint))
+
+
+def start_job(kind, func, *args, failure_endpoint='index'):
+    """Queue a background job for this session and point the client at its status"""
+    try:
+        job = JOBS.submit(kind, func, *args, owner=session['session_id'])
+    except QueueFull as e:
+        return reject(f'The server is busy: {str(e)}', failure_endpoint)
+    session['job_id'] = job.id
+    if wants_json():
+        return jsonify({'job_id': job.id,
+                        'status_url': url_for('job_status', job_id=job.id),
+                        'cancel_url': url_for('cancel_job', job_id=job.id)}), 202
+    return redirect(url_for('job_wait', job_id=job.id))
+
+
+def _fetch_job(job, docket_id, session_folder):
+    """Harvest a docket into the session folder (runs on a job worker)"""
+    def progress(done, total):
+        job.update(f'Processed {done} of {total} comments', done / total if total else None)
+    
+    resumed = None
+    if has_checkpoint(docket_id):
+        # Pick up an interrupted (or cancelled) harvest instead of starting over;
+        # raises HarvestInProgress while another job or the CLI is still running it
+        job.update(f'Resuming the interrupted harvest for docket ID: {docket_id}')
+        resumed = resume_harvest(docket_id, progress=progress)
+    if resumed is not None:
+        csv_filename, all_comments = resumed
+    else:
+        job.update(f'Listing comments for docket ID: {docket_id}')
+        # Get all comments for every document in the docket
+        all_comments, document_counts = get_comments_for_docket(docket_id)
+        
+        if not document_counts:
+            raise ValueError(f'No documents found for docket ID: {docket_id}')
+        
+        if not all_comments:
+            raise ValueError(f'No comments found for docket ID: {docket_id}')
+        
+        # Save comments to CSV
+        job.update(f'Found {len(all_comments)} comments, downloading details and attachments', 0.0)
+        csv_filename = save_comments_to_csv(all_comments, docket_id, progress=progress)
+    
+    # Move the CSV to the session folder
+    os.rename(csv_filename, os.path.join(session_folder, csv_filename))
+    
+    return {
+        'session': {
+            'csv_filename': csv_filename,
+            'docket_id': docket_id,
+            'search_key': docket_id,
+            'comment_count': len(all_comments),
+        },
+        'flash': f'Successfully retrieved {len(all_comments)} comments for docket ID: {docket_id}',
+        'endpoint': 'upload_pdf',
+    }
+
+
 @app.route('/fetch_comments', methods=['POST'])
 def fetch_comments():
     # Get the docket ID from the form
-    docket_id = request.form.get('docket_id')
+    docket_id = (request.form.get('docket_id') or '').strip()
     
-    if not docket_id:
-        flash('Please enter a valid docket ID', 'error')
-        return redirect(url_for('index'))
+    if not valid_docket_id(docket_id):
+        return reject('Please enter a valid docket ID (letters, digits, "-" and "_" only)', 'index')
     
     # Generate a unique session ID to keep track of this user's files
     if 'session_id' not in session:
@@ -51,47 +149,66 @@ def fetch_comments():
     
     session_id = session['session_id']
     
+    # Create a folder for this session if it doesn't exist
+    session_folder = os.path.join(app.config['OUTPUT_FOLDER'], session_id)
+    os.makedirs(session_folder, exist_ok=True)
+    
+    return start_job('fetch', _fetch_job, docket_id, session_folder)
+
+
+@app.route('/upload_comments', methods=['POST'])
+def upload_comments():
+    """Start from a previously downloaded CSV/TSV export instead of the API"""
+    file = request.files.get('downloaded_comments')
+    if not file or file.filename == '':
+        flash('Please select a CSV or TSV file of comments', 'error')
+        return redirect(url_for('index'))
+    
+    if not file.filename.lower().endswith(('.csv', '.tsv', '.txt')):
+        flash('Only CSV or TSV comment files are allowed', 'error')
+        return redirect(url_for('index'))
+    
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+    
+    session_id = session['session_id']
+    session_folder = os.path.join(app.config['OUTPUT_FOLDER'], session_id)
+    os.makedirs(session_folder, exist_ok=True)
+    
+    upload_filename = secure_filename(file.filename)
+    upload_path = os.path.join(session_folder, 'upload_' + upload_filename)
+    file.save(upload_path)
+    
     try:
-        # Create a folder for this session if it doesn't exist
-        session_folder = os.path.join(app.config['OUTPUT_FOLDER'], session_id)
-        os.makedirs(session_folder, exist_ok=True)
-        
-        # Get all documents for the docket
-        documents = get_documents_for_docket(docket_id)
-        
-        if not documents:
-            flash(f'No documents found for docket ID: {docket_id}', 'error')
-            return redirect(url_for('index'))
-        
-        # Get all comments for each document
-        all_comments = []
-        for doc in documents:
-            object_id = doc.get("attributes", {}).get("objectId")
-            if object_id:
-                document_comments = get_comments_for_document(object_id)
-                all_comments.extend(document_comments)
-        
-        if not all_comments:
-            flash(f'No comments found for docket ID: {docket_id}', 'error')
-            return redirect(url_for('index'))
-        
-        # Save comments to CSV
-        csv_filename = save_comments_to_csv(all_comments, docket_id)
-        
-        # Move the CSV to the session folder
-        os.rename(csv_filename, os.path.join(session_folder, csv_filename))
-        
-        # Store the CSV filename in the session
-        session['csv_filename'] = csv_filename
-        session['docket_id'] = docket_id
-        session['comment_count'] = len(all_comments)
-        
-        flash(f'Successfully retrieved {len(all_comments)} comments for docket ID: {docket_id}', 'success')
-        return redirect(url_for('upload_pdf'))
-        
-    except Exception as e:
-        flash(f'Error fetching comments: {str(e)}', 'error')
+        csv_filename = os.path.splitext(upload_filename)[0] + '_comments.csv'
+        _, comment_count = ingest_export(upload_path, os.path.join(session_folder, csv_filename))
+    except ValueError as e:
+        flash(f'Error reading comment file: {str(e)}', 'error')
+        return redirect(url_for('index'))
+    finally:
+        os.remove(upload_path)
+    
+    if not comment_count:
+        flash('No comments found in the uploaded file', 'error')
         return redirect(url_for('index'))
+    
+    docket_id = request.form.get('docket_id') or os.path.splitext(upload_filename)[0]
+    # Uploaded text is indexed under this session only, never under a real
+    # docket's ID where it would replace harvested comments for everyone
+    search_key = f'upload:{session_id}'
+    search_index = get_search_index()
+    if search_index is not None:
+        # A new upload replaces the session's previous one
+        search_index.clear(search_key)
+        search_index.add_csv(search_key, os.path.join(session_folder, csv_filename))
+    
+    session['csv_filename'] = csv_filename
+    session['docket_id'] = docket_id
+    session['search_key'] = search_key
+    session['comment_count'] = comment_count
+    
+    flash(f'Loaded {comment_count} comments from {upload_filename}', 'success')
+    return redirect(url_for('upload_pdf'))
 
 
 @app.route('/upload_pdf')
@@ -108,160 +225,156 @@ def upload_pdf():
 @app.route('/classify_comments', methods=['POST'])
 def classify_comments():
     if 'csv_filename' not in session:
-        flash('Please start by entering a docket ID', 'error')
-        return redirect(url_for('index'))
+        return reject('Please start by entering a docket ID', 'index')
     
     # Check if file was uploaded
     if 'rule_pdf' not in request.files:
-        flash('No PDF file uploaded', 'error')
-        return redirect(url_for('upload_pdf'))
+        return reject('No PDF file uploaded', 'upload_pdf')
     
     file = request.files['rule_pdf']
     
     # Check if user submitted empty file input
     if file.filename == '':
-        flash('No PDF file selected', 'error')
-        return redirect(url_for('upload_pdf'))
+        return reject('No PDF file selected', 'upload_pdf')
     
     session_id = session['session_id']
     session_folder = os.path.join(app.config['OUTPUT_FOLDER'], session_id)
     
-    if file and file.filename.lower().endswith('.pdf'):
-        # Save PDF file
-        pdf_filename = secure_filename(file.filename)
-        pdf_path = os.path.join(session_folder, pdf_filename)
-        file.save(pdf_path)
-        
-        # Get the CSV file path
-        csv_filename = session['csv_filename']
-        csv_path = os.path.join(session_folder, csv_filename)
-        
-        try:
-            # Create instance of classifier
-            classifier = cc2.SubstantiveCommentClassifier()
-            
-            # Load the model or train a new one
-            if os.path.exists("substantive_classifier_model.pkl"):
-                classifier.load_model()
-            else:
-                if not classifier.load_training_data():
-                    flash('Error loading training data', 'error')
-                    return redirect(url_for('upload_pdf'))
-                classifier.train_models()
-                classifier.save_model()
-            
-            # Process the rule PDF
-            rule_features = classifier.read_pdf(pdf_path)
-            
-            # Load comments from CSV
-            # Need to temporarily copy the CSV to the current directory for the classifier
-            temp_csv_path = os.path.basename(csv_path)
-            os.system(f"cp '{csv_path}' '{temp_csv_path}'")
-            
-            # Load comments
-            comment_col = classifier.load_comments_csv(temp_csv_path)
-            
-            if comment_col is None:
-                flash('Error loading comments from CSV', 'error')
-                return redirect(url_for('upload_pdf'))
-            
-            # Classify comments
-            if not classifier.classify_comments(rule_features):
-                flash('Error classifying comments', 'error')
-                return redirect(url_for('upload_pdf'))
-            
-            # Save results
-            classifier.save_results()
-            
-            # Move the result file to the session folder
-            os.rename("classified_comments.csv", os.path.join(session_folder, "classified_comments.csv"))
-            
-            # Also save as TSV for better handling of complex content
-            df = pd.read_csv(os.path.join(session_folder, "classified_comments.csv"))
-            tsv_path = os.path.join(session_folder, "classified_comments.tsv")
-            df.to_csv(tsv_path, sep='\t', index=False)
-            
-            # Store TSV filename in session
-            session['classified_tsv'] = "classified_comments.tsv"
-            
-            # Clean up temp file
-            if os.path.exists(temp_csv_path):
-                os.remove(temp_csv_path)
-            
-            # Store results in session
-            session['classified_csv'] = "classified_comments.csv"
-            session['total_comments'] = int(len(df))  # Convert to native int
-            session['substantive_comments'] = int(df['Substantive'].sum())  # Convert to native int
-            session['nonsubstantive_comments'] = int(len(df) - df['Substantive'].sum())  # Convert to native int
-            
-            # Create visualizations and encode them as base64 for embedding in HTML
-            create_visualizations(df, session_folder)
-            
-            return redirect(url_for('results'))
-            
-        except Exception as e:
-            flash(f'Error in classification process: {str(e)}', 'error')
-            return redirect(url_for('upload_pdf'))
-    else:
-        flash('Only PDF files are allowed', 'error')
-        return redirect(url_for('upload_pdf'))
-
-
-def create_visualizations(df, folder):
-    """Create visualizations from classification results"""
-    if 'Substantive' in df.columns and df['Substantive'].dtype == object:
-        df['Substantive'] = df['Substantive'].map({'True': True, 'False': False})
-    
-    # Create pie chart
-    plt.figure(figsize=(8, 8))
-    counts = df['Substantive'].value_counts()
-    labels = ['Substantive', 'Non-substantive']
-    values = [counts.get(True, 0), counts.get(False, 0)]
-    plt.pie(values, labels=labels, autopct='%1.1f%%', startangle=90, colors=['#4CAF50', '#F44336'])
-    plt.title('Comment Classification Results')
-    plt.tight_layout()
-    pie_chart_path = os.path.join(folder, 'classification_pie.png')
-    plt.savefig(pie_chart_path)
-    plt.close()
-    
-    # Create confidence distribution chart
-    if 'Confidence' in df.columns:
-        plt.figure(figsize=(10, 6))
-        # Create separate series for substantive and non-substantive
-        substantive_conf = df[df['Substantive'] == True]['Confidence']
-        nonsubstantive_conf = df[df['Substantive'] == False]['Confidence']
-        
-        if len(substantive_conf) > 0 and len(nonsubstantive_conf) > 0:
-            plt.hist([substantive_conf, nonsubstantive_conf], bins=10, 
-                     label=['Substantive', 'Non-substantive'], alpha=0.7,
-                     color=['#4CAF50', '#F44336'])
-            plt.xlabel('Confidence Score')
-            plt.ylabel('Number of Comments')
-            plt.title('Confidence Score Distribution')
-            plt.legend()
-            plt.tight_layout()
-            
-            # Save chart
-            confidence_chart_path = os.path.join(folder, 'confidence_histogram.png')
-            plt.savefig(confidence_chart_path)
-        plt.close()
-    
-    # Create comment length comparison chart
-    if 'Comment_Length' in df.columns:
-        plt.figure(figsize=(10, 6))
-        substantive_len = df[df['Substantive'] == True]['Comment_Length']
-        nonsubstantive_len = df[df['Substantive'] == False]['Comment_Length']
-        
-        if len(substantive_len) > 0 and len(nonsubstantive_len) > 0:
-            plt.boxplot([substantive_len, nonsubstantive_len], labels=['Substantive', 'Non-substantive'])
-            plt.ylabel('Comment Length (characters)')
-            plt.title('Comment Length Comparison')
-            plt.tight_layout()
-            
-            # Save chart
-            length_chart_path = os.path.join(folder, 'length_comparison.png')
-            plt.savefig(length_chart_path)
-        plt.close()
+    if not file.filename.lower().endswith('.pdf'):
+        return reject('Only PDF files are allowed', 'upload_pdf')
+    
+    # Save PDF file
+    pdf_filename = secure_filename(file.filename)
+    pdf_path = os.path.join(session_folder, pdf_filename)
+    file.save(pdf_path)
+    
+    return start_job('classify', _classify_job, session_folder, session['csv_filename'], pdf_path,
+                     session.get('comment_count'), failure_endpoint='upload_pdf')
+
+
+def _classify_job(job, session_folder, csv_filename, pdf_path, comment_count=None):
+    """Classify a session's comments against a rule PDF (runs on a job worker)"""
+    # Get the CSV file path
+    csv_path = os.path.join(session_folder, csv_filename)
+    
+    # Per-run copy of the model loaded once at startup
+    classifier, model_version = MODELS.get()
+    
+    # Process the rule PDF
+    job.update('Reading the rule PDF', 0.2)
+    # Re-uploads of the same rule reuse its cached features
+    rule_features = RULE_CACHE.get_or_compute(pdf_path, classifier.read_pdf, model_version)
+    
+    # Form letters are classified once per near-duplicate cluster. Large dockets
+    # are classified in chunks across cores, writing results as they come;
+    # either way results go only to this session's folder.
+    def progress(message, fraction):
+        job.update(message, 0.3 + 0.6 * fraction if fraction is not None else None)
+    
+    job.update('Grouping near-duplicate comments', 0.25)
+    with metrics.CLASSIFICATION_SECONDS.time():
+        summary = classify_docket(csv_path, rule_features, session_folder,
+                                  classifier=classifier, factory=cc2.SubstantiveCommentClassifier,
+                                  streaming=bool(comment_count and comment_count >= STREAMING_MIN_ROWS),
+                                  deduplicate=app.config['DEDUPLICATE_COMMENTS'],
+                                  cache=RESULT_CACHE, cache_key=(model_version, file_sha256(pdf_path)),
+                                  progress=progress)
+    metrics.COMMENTS_CLASSIFIED.inc(summary['total'])
+    
+    # Charts are drawn on demand by serve_image
+    return {
+        'session': {
+            'classified_tsv': "classified_comments.tsv",
+            'classified_csv': "classified_comments.csv",
+            'total_comments': summary['total'],
+            'substantive_comments': summary['substantive'],
+            'nonsubstantive_comments': summary['nonsubstantive'],
+        },
+        'endpoint': 'results',
+    }
+
+
+def _apply_job_result(job):
+    """Copy a finished job's session values into the owner's session, once"""
+    if job.owner != session.get('session_id') or session.get('applied_job_id') == job.id:
+        return
+    session.update(job.result.get('session', {}))
+    session['applied_job_id'] = job.id
+    session.pop('job_id', None)
+    if job.result.get('flash'):
+        flash(job.result['flash'], 'success')
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = JOBS.get(job_id)
+    if job is None or job.owner != session.get('session_id'):
+        return jsonify({'error': 'Job not found'}), 404
+    
+    status = job.to_dict()
+    if job.status == SUCCEEDED:
+        _apply_job_result(job)
+        status['redirect'] = url_for(job.result['endpoint'])
+    return jsonify(status)
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = JOBS.get(job_id)
+    if job is None or job.owner != session.get('session_id'):
+        return jsonify({'error': 'Job not found'}), 404
+    
+    cancelled = JOBS.cancel(job_id)
+    if wants_json():
+        return jsonify({'cancelled': cancelled, 'status': job.status})
+    flash('Job cancelled' if cancelled else 'Job already finished', 'info')
+    return redirect(url_for('upload_pdf' if job.kind == 'classify' else 'index'))
+
+
+@app.route('/jobs/<job_id>/wait')
+def job_wait(job_id):
+    """Progress page for browsers without JavaScript; refreshes until the job ends"""
+    job = JOBS.get(job_id)
+    if job is None or job.owner != session.get('session_id'):
+        flash('Job not found', 'error')
+        return redirect(url_for('index'))
+    
+    failure_endpoint = 'upload_pdf' if job.kind == 'classify' else 'index'
+    if job.status == SUCCEEDED:
+        _apply_job_result(job)
+        return redirect(url_for(job.result['endpoint']))
+    if job.status == FAILED:
+        flash(f'Error in {job.kind} job: {job.error}', 'error')
+        return redirect(url_for(failure_endpoint))
+    if job.status == CANCELLED:
+        flash('Job cancelled', 'info')
+        return redirect(url_for(failure_endpoint))
+    
+    return render_template('job_status.html', job=job.to_dict(),
+                          cancel_url=url_for('cancel_job', job_id=job.id))
+
+
+# Result columns the comment viewer shows or filters on
+VIEWER_COLUMNS = ['id', 'comment', 'Substantive', 'Confidence', 'Reason', 'Comment_Length',
+                  'cluster_id', 'cluster_size']
+VIEWER_PAGE_SIZE = 50
+
+
+def results_summary(session_folder):
+    """Return the session's results summary, building it for results that predate it"""
+    summary = load_summary(session_folder)
+    if summary is None:
+        summary = write_results(load_results(session_folder), session_folder)
+    return summary
+
+
+def _optional_float(value):
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
 
 
 @app.route('/comment_viewer')
@@ -270,55 +383,111 @@ def comment_viewer():
         flash('No classification results available', 'error')
         return redirect(url_for('index'))
     
-    session_id = session['session_id']
-    session_folder = os.path.join(app.config['OUTPUT_FOLDER'], session_id)
-    
-    # Read the classification results
+    session_folder = os.path.join(app.config['OUTPUT_FOLDER'], session['session_id'])
     try:
-        # Try to read TSV if available, otherwise fall back to CSV
-        if 'classified_tsv' in session:
-            df = pd.read_csv(os.path.join(session_folder, session['classified_tsv']), sep='\t')
-        else:
-            df = pd.read_csv(os.path.join(session_folder, session['classified_csv']))
-        
-        # Convert 'Substantive' column to proper boolean type if it's a string
-        if 'Substantive' in df.columns and df['Substantive'].dtype == object:
-            df['Substantive'] = df['Substantive'].map({'True': True, 'False': False})
-            
-        # Ensure comment column exists and is not null
-        if 'comment' not in df.columns:
-            # Try to find an alternate comment column
-            comment_cols = [col for col in df.columns if 'comment' in col.lower()]
-            if comment_cols:
-                df.rename(columns={comment_cols[0]: 'comment'}, inplace=True)
-            else:
-                flash('Comment column not found in data', 'error')
-                return redirect(url_for('results'))
-        
-        # Fill NA/None values in comment column with empty string
-        df['comment'] = df['comment'].fillna('')
-        
-        # Prepare data for template
-        comments = df.to_dict('records')
-        
-        return render_template('comment_viewer.html',
-                              docket_id=session.get('docket_id'),
-                              comments=comments)
-    
+        summary = results_summary(session_folder)
     except Exception as e:
         flash(f'Error loading comment data: {str(e)}', 'error')
         return redirect(url_for('results'))
+    
+    # Rows are fetched page by page from the API as the viewer scrolls
+    return render_template('comment_viewer.html',
+                          docket_id=session.get('docket_id'),
+                          total=summary['total'],
+                          has_confidence='Confidence' in summary['columns'],
+                          page_size=VIEWER_PAGE_SIZE,
+                          api_url=url_for('api_comments'),
+                          search_url=url_for('api_search'))
+
+
+@app.route('/api/comments')
+def api_comments():
+    """One page of classified comments, filtered and sorted server-side"""
+    if 'classified_csv' not in session:
+        return jsonify({'error': 'No classification results available'}), 404
+    
+    session_folder = os.path.join(app.config['OUTPUT_FOLDER'], session['session_id'])
+    summary = results_summary(session_folder)
+    
+    args = request.args
+    per_page = max(1, min(args.get('per_page', VIEWER_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    if 'offset' in args:
+        offset = max(0, args.get('offset', 0, type=int))
+    else:
+        offset = (max(1, args.get('page', 1, type=int)) - 1) * per_page
+    substantive = {'true': True, 'false': False}.get(args.get('substantive', '').lower())
+    
+    total, positions = query_positions(
+        session_folder, summary['version'],
+        substantive=substantive,
+        length=args.get('length'),
+        id_prefix=args.get('id_prefix', '').strip() or None,
+        min_confidence=_optional_float(args.get('min_confidence')),
+        max_confidence=_optional_float(args.get('max_confidence')),
+        sort=args.get('sort', 'position'),
+        descending=args.get('order', 'asc').lower() == 'desc',
+        offset=offset,
+        limit=per_page)
+    columns = [column for column in VIEWER_COLUMNS if column in summary['columns']]
+    comments = read_rows(session_folder, positions, columns) if positions else []
+    
+    return jsonify({
+        'total': total,
+        'offset': offset,
+        'page': offset // per_page + 1,
+        'per_page': per_page,
+        'comments': comments,
+    })
+
+
+@app.route('/api/search')
+def api_search():
+    """Ranked full-text search over the session docket's comments, with highlighted snippets"""
+    search_index = get_search_index()
+    # Harvested dockets are indexed by docket ID, uploads per session
+    search_key = session.get('search_key') or session.get('docket_id')
+    if search_index is None or not search_key:
+        return jsonify({'error': 'No comments to search'}), 404
+    
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 20, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    if not query:
+        return jsonify({'query': query, 'total': 0, 'results': []})
+    
+    started = time.perf_counter()
+    try:
+        total, results = search_index.search(search_key, query, limit, offset)
+    except sqlite3.OperationalError as e:
+        return jsonify({'error': f'Invalid search query: {str(e)}'}), 400
+    return jsonify({
+        'query': query,
+        'total': total,
+        'offset': offset,
+        'results': results,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    })
 
 
 # Add a route to serve images directly
 @app.route('/image/<session_id>/<image_name>')
 def serve_image(session_id, image_name):
-    image_path = os.path.join(app.config['OUTPUT_FOLDER'], session_id, image_name)
-    if os.path.exists(image_path):
-        return send_file(image_path, mimetype='image/png')
-    else:
-        # Return a placeholder image or 404
+    session_folder = os.path.join(app.config['OUTPUT_FOLDER'], secure_filename(session_id))
+    summary = load_summary(session_folder) if image_name in CHARTS else None
+    if summary is None:
         return "Image not found", 404
+    
+    # The data version identifies the chart's content; unchanged charts get a 304
+    etag = f"{os.path.splitext(image_name)[0]}-{summary['version']}"
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
+    image_path = get_chart(session_folder, image_name, summary['version'])
+    if image_path is None:
+        return "Image not found", 404
+    return send_file(image_path, mimetype='image/png', etag=etag, max_age=0)
 
 
 @app.route('/results')
@@ -329,13 +498,7 @@ def results():
     
     session_id = session['session_id']
     session_folder = os.path.join(app.config['OUTPUT_FOLDER'], session_id)
-    df = pd.read_csv(os.path.join(session_folder, session['classified_csv']))
-    
-    if 'Substantive' in df.columns and df['Substantive'].dtype == object:
-        df['Substantive'] = df['Substantive'].map({'True': True, 'False': False})
-    
-    substantive_examples = df[df['Substantive'] == True].head(5)
-    nonsubstantive_examples = df[df['Substantive'] == False].head(5)
+    summary = results_summary(session_folder)
     
     # Create URLs for the images using our new route
     pie_chart = url_for('serve_image', session_id=session_id, image_name='classification_pie.png')
@@ -347,8 +510,8 @@ def results():
                           total_comments=session.get('total_comments'),
                           substantive_comments=session.get('substantive_comments'),
                           nonsubstantive_comments=session.get('nonsubstantive_comments'),
-                          substantive_examples=substantive_examples.to_dict('records'),
-                          nonsubstantive_examples=nonsubstantive_examples.to_dict('records'),
+                          substantive_examples=summary['examples']['substantive'],
+                          nonsubstantive_examples=summary['examples']['nonsubstantive'],
                           pie_chart=pie_chart,
                           confidence_chart=confidence_chart,
                           length_chart=length_chart)
@@ -382,7 +545,7 @@ def download(filename):
             # Try to create TSV if it doesn't exist
             if 'classified_csv' in session:
                 try:
-                    df = pd.read_csv(os.path.join(session_folder, session['classified_csv']))
+                    df = load_results(session_folder)
                     tsv_path = os.path.join(session_folder, "classified_comments.tsv")
                     df.to_csv(tsv_path, sep='\t', index=False)
                     session['classified_tsv'] = "classified_comments.tsv"
@@ -408,4 +571,5 @@ def reset():
 
 
 if __name__ == '__main__':
+    MODELS.preload()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""Content-addressed cache of extracted attachment text
+
+Mass-mail campaigns attach the same file to thousands of comments. Extracted
+text is stored once per SHA-256 of the file contents, and every attachment URL
+seen is mapped to its content hash. A known URL skips the download entirely, and
+a new URL whose bytes hash to known content skips parsing. The store is a SQLite
+file shared across dockets and runs, capped in size with least recently used
+texts evicted first.
+"""
+import hashlib
+import time
+import zlib
+
+from sqlite_lru import SQLiteLRUCache
+
+DEFAULT_CACHE_PATH = "attachment_text_cache.sqlite"
+DEFAULT_MAX_BYTES = 1024 ** 3
+# Bumped when extracted text changes meaning; older cached texts are dropped.
+# 2: attachment text no longer has "<...>" spans stripped as if they were tags
+TEXT_VERSION = 2
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AttachmentTextCache(SQLiteLRUCache):
+    """SQLite store of attachment text keyed by content hash and by URL"""
+
+    table = "texts"
+    key_column = "hash"
+    schema = (
+        "CREATE TABLE IF NOT EXISTS texts ("
+        " hash TEXT PRIMARY KEY, body BLOB, size INTEGER, last_access REAL)",
+        "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT)",
+        "CREATE INDEX IF NOT EXISTS urls_hash ON urls(hash)",
+    )
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path, max_bytes)
+        self.url_hits = 0
+        self.content_hits = 0
+        self.misses = 0
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != TEXT_VERSION:
+            self._conn.execute("DELETE FROM texts")
+            self._conn.execute("DELETE FROM urls")
+            self._conn.execute(f"PRAGMA user_version = {TEXT_VERSION}")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def _get(self, content_hash):
+        row = self._conn.execute("SELECT body FROM texts WHERE hash = ?", (content_hash,)).fetchone()
+        if row is None:
+            return None
+        self._touch([content_hash])
+        self._conn.commit()
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def lookup_url(self, url):
+        """Return cached text for an attachment URL seen before, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT hash FROM urls WHERE url = ?", (url,)).fetchone()
+            text = self._get(row[0]) if row else None
+            if text is not None:
+                self.url_hits += 1
+            return text
+
+    def lookup_content(self, url, content_hash):
+        """Return cached text for file contents, remembering the URL on a hit"""
+        with self._lock:
+            text = self._get(content_hash)
+            if text is None:
+                self.misses += 1
+                return None
+            self._conn.execute("INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)", (url, content_hash))
+            self._conn.commit()
+            self.content_hits += 1
+            return text
+
+    def store(self, url, content_hash, text):
+        """Store extracted text for file contents downloaded from url"""
+        body = zlib.compress(text.encode("utf-8"))
+        with self._lock:
+            replaced = self._replaced([content_hash])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO texts (hash, body, size, last_access) VALUES (?, ?, ?, ?)",
+                (content_hash, body, len(body), time.time()),
+            )
+            self._conn.execute("INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)", (url, content_hash))
+            self._grow(len(body) - replaced)
+            self._conn.commit()
+
+    def _evict(self):
+        # URLs pointing at evicted texts would otherwise be lookups that always miss
+        doomed = super()._evict()
+        self._conn.executemany("DELETE FROM urls WHERE hash = ?", doomed)
+        return doomed
+
+    def stats(self):
+        with self._lock:
+            texts = self._entries()
+            urls = self._conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+            return {
+                "url_hits": self.url_hits,
+                "content_hits": self.content_hits,
+                "misses": self.misses,
+                "texts": texts,
+                "urls": urls,
+                "bytes": self._total_bytes,
+            }
@@ -0,0 +1,164 @@
+"""Process pool for attachment text extraction
+
+PDF and DOCX parsing is CPU-bound and holds the GIL, so it runs in separate
+worker processes, one per core by default. Every job has a hard timeout and
+each worker runs under an address-space limit. A worker that hangs, crashes
+or runs out of memory is killed and replaced, and the file is recorded in
+`failures` instead of stalling the harvest.
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import ATTACHMENT_EXTRACTION_FAILURES
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+ATTACHMENT_WORKERS = os.cpu_count() or 2
+# Seconds a single file may take before its worker is killed
+ATTACHMENT_TIMEOUT = 120
+# Address-space limit per worker process in bytes
+ATTACHMENT_MEMORY_LIMIT = 1024 ** 3
+
+# spawn avoids forking a parent that has fetcher threads running
+_context = multiprocessing.get_context("spawn")
+
+
+def _worker_main(conn, memory_limit):
+    """Worker loop: receive (extension, path or bytes), reply ("ok", text) or ("error", reason)"""
+    from newcommentbuilder import read_pdf_text, read_docx_text
+    readers = {".pdf": read_pdf_text, ".docx": read_docx_text, ".doc": read_docx_text}
+
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        extension, source = job
+        try:
+            conn.send(("ok", readers[extension](source)))
+        except MemoryError:
+            conn.send(("error", "memory limit exceeded"))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class _Worker:
+    """One extraction process plus the pipe used to talk to it"""
+
+    def __init__(self, memory_limit):
+        self.memory_limit = memory_limit
+        self.process = None
+        self.conn = None
+
+    def _start(self):
+        self.conn, child_conn = _context.Pipe()
+        self.process = _context.Process(target=_worker_main, args=(child_conn, self.memory_limit),
+                                        daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def _kill(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def run(self, extension, source, timeout):
+        if self.process is None or not self.process.is_alive():
+            self._start()
+        try:
+            self.conn.send((extension, source))
+            if not self.conn.poll(timeout):
+                self._kill()
+                return "error", f"timed out after {timeout}s"
+            return self.conn.recv()
+        except (EOFError, OSError):
+            # The worker died mid-job, most likely killed for using too much memory
+            self._kill()
+            return "error", "worker process died"
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(1)
+        self._kill()
+
+
+class AttachmentPool:
+    """Bounded pool of extraction processes with per-file timeouts"""
+
+    def __init__(self, workers=ATTACHMENT_WORKERS, timeout=ATTACHMENT_TIMEOUT,
+                 memory_limit=ATTACHMENT_MEMORY_LIMIT):
+        self.timeout = timeout
+        self.failures = []
+        self._failures_lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._workers = [_Worker(memory_limit) for _ in range(workers)]
+        for worker in self._workers:
+            self._idle.put(worker)
+        # Dispatch threads only wait on pipes; the parsing happens in the workers
+        self._dispatcher = ThreadPoolExecutor(max_workers=workers)
+
+    def _run(self, extension, source, label):
+        worker = self._idle.get()
+        started = time.monotonic()
+        try:
+            status, result = worker.run(extension, source, self.timeout)
+        finally:
+            self._idle.put(worker)
+        if status == "ok":
+            return result
+        print(f"  Attachment extraction failed for {label}: {result}")
+        ATTACHMENT_EXTRACTION_FAILURES.inc()
+        with self._failures_lock:
+            self.failures.append({"file": label, "reason": result,
+                                  "seconds": round(time.monotonic() - started, 1)})
+        return ""
+
+    def submit(self, source, extension, label=None):
+        """Queue a file path or its bytes for extraction; returns a Future resolving to its text"""
+        if label is None:
+            label = source if isinstance(source, str) else f"<{len(source)} byte {extension} file>"
+        return self._dispatcher.submit(self._run, extension, source, label)
+
+    def extract(self, source, extension, label=None):
+        """Extract text from a file path or bytes in a worker process, returning "" on failure"""
+        return self.submit(source, extension, label).result()
+
+    def close(self):
+        self._dispatcher.shutdown(wait=True)
+        for worker in self._workers:
+            worker.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_attachment_pool():
+    """Return the process-wide extraction pool, starting it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = AttachmentPool()
+                atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,62 @@
+"""Micro-benchmark: textnorm.normalize_text against the original clean_text
+
+Usage: python bench_textnorm.py [megabytes ...]
+
+Inputs are built by repeating comment text from the bundled FSIS-2011-0018
+export (which contains HTML residue and entities) up to each requested size.
+"""
+import csv
+import sys
+import time
+
+from textnorm import normalize_text
+
+SAMPLE_TSV = "FSIS20110018_comments_20250403_144546.tsv"
+
+
+def legacy_clean_text(text):
+    """The clean_text implementation normalize_text replaced"""
+    if not text:
+        return ""
+    cleaned = ""
+    for char in text:
+        if char in ('\n', '\t', '\r') or (ord(char) >= 32 and ord(char) < 127):
+            cleaned += char
+    return cleaned.strip()
+
+
+def load_sample():
+    csv.field_size_limit(sys.maxsize)
+    with open(SAMPLE_TSV, newline="", encoding="utf-8") as f:
+        rows = csv.DictReader(f, delimiter="\t")
+        return "\n\n".join(row["comment"] for row in rows if row.get("comment"))
+
+
+def build_input(sample, megabytes):
+    size = int(megabytes * 1024 * 1024)
+    return (sample * (size // len(sample) + 1))[:size]
+
+
+def best_of(func, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [1, 4, 16]
+    sample = load_sample()
+    print(f"{'input':>8}  {'clean_text':>12}  {'normalize_text':>15}  {'speedup':>8}")
+    for megabytes in sizes:
+        text = build_input(sample, megabytes)
+        legacy = best_of(legacy_clean_text, text, 1)
+        fast = best_of(normalize_text, text, 3)
+        print(f"{megabytes:>6.1f}MB  {legacy:>11.3f}s  {fast:>14.3f}s  {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""On-demand rendering of the results page charts
+
+Charts are drawn only when a browser asks for them, with matplotlib's
+object-oriented Agg API (a Figure per chart, no pyplot global state) so
+concurrent requests on a threaded server don't interfere. Each PNG is cached
+in the session folder under the results' data version, which also serves as
+its ETag; a new classification run gets a new version and fresh charts. A
+chart that doesn't apply to the data leaves an empty ".none" marker instead,
+so the results aren't reloaded to find that out again.
+"""
+import os
+import threading
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from results_store import load_results
+
+COLORS = ['#4CAF50', '#F44336']
+LABELS = ['Substantive', 'Non-substantive']
+
+
+def _split(df, column):
+    return df[df['Substantive'] == True][column], df[df['Substantive'] == False][column]
+
+
+def render_pie(df):
+    fig = Figure(figsize=(8, 8))
+    ax = fig.add_subplot()
+    counts = df['Substantive'].value_counts()
+    values = [counts.get(True, 0), counts.get(False, 0)]
+    ax.pie(values, labels=LABELS, autopct='%1.1f%%', startangle=90, colors=COLORS)
+    ax.set_title('Comment Classification Results')
+    fig.tight_layout()
+    return fig
+
+
+def render_confidence(df):
+    if 'Confidence' not in df.columns:
+        return None
+    substantive_conf, nonsubstantive_conf = _split(df, 'Confidence')
+    if len(substantive_conf) == 0 or len(nonsubstantive_conf) == 0:
+        return None
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    ax.hist([substantive_conf.dropna(), nonsubstantive_conf.dropna()], bins=10,
+            label=LABELS, alpha=0.7, color=COLORS)
+    ax.set_xlabel('Confidence Score')
+    ax.set_ylabel('Number of Comments')
+    ax.set_title('Confidence Score Distribution')
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def render_length(df):
+    if 'Comment_Length' not in df.columns:
+        return None
+    substantive_len, nonsubstantive_len = _split(df, 'Comment_Length')
+    if len(substantive_len) == 0 or len(nonsubstantive_len) == 0:
+        return None
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    ax.boxplot([substantive_len.dropna(), nonsubstantive_len.dropna()], tick_labels=LABELS)
+    ax.set_ylabel('Comment Length (characters)')
+    ax.set_title('Comment Length Comparison')
+    fig.tight_layout()
+    return fig
+
+
+# Image name -> (renderer, result columns it reads)
+CHARTS = {
+    'classification_pie.png': (render_pie, ['Substantive']),
+    'confidence_histogram.png': (render_confidence, ['Substantive', 'Confidence']),
+    'length_comparison.png': (render_length, ['Substantive', 'Comment_Length']),
+}
+
+_render_locks = {}
+_render_locks_lock = threading.Lock()
+
+
+def chart_path(folder, name, version):
+    stem, extension = os.path.splitext(name)
+    return os.path.join(folder, f"{stem}.{version}{extension}")
+
+
+def _remove_stale(folder, name, keep):
+    """Drop charts (and markers) rendered from earlier runs' data"""
+    stem = os.path.splitext(name)[0] + '.'
+    for entry in os.listdir(folder):
+        if entry.startswith(stem) and entry.endswith(('.png', '.none')) and entry not in keep:
+            os.remove(os.path.join(folder, entry))
+
+
+def get_chart(folder, name, version):
+    """Return the path of a chart for this data version, rendering it on first use
+
+    Returns None when the chart doesn't apply (e.g. no confidence scores).
+    """
+    render, columns = CHARTS[name]
+    path = chart_path(folder, name, version)
+    marker = path + '.none'
+    if os.path.exists(path):
+        return path
+    if os.path.exists(marker):
+        return None
+
+    with _render_locks_lock:
+        lock = _render_locks.setdefault(path, threading.Lock())
+    try:
+        with lock:
+            # Another request may have rendered it while we waited
+            if os.path.exists(path):
+                return path
+            if os.path.exists(marker):
+                return None
+            fig = render(load_results(folder, columns=columns))
+            if fig is None:
+                open(marker, 'w').close()
+                _remove_stale(folder, name, {os.path.basename(marker)})
+                return None
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                FigureCanvasAgg(fig).print_png(f)
+            os.replace(tmp_path, path)
+            _remove_stale(folder, name, {os.path.basename(path)})
+            return path
+    finally:
+        with _render_locks_lock:
+            _render_locks.pop(path, None)
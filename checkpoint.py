@@ -0,0 +1,157 @@
+"""Checkpoint journal that lets an interrupted harvest resume where it stopped
+
+A journal is a small directory per docket holding:
+  meta.json        docket id and output CSV file name
+  listed.jsonl     the comment listing, so resuming skips the list requests
+  completed.log    one "<comment id>\t<byte offset>" line per row written
+
+Rows are flushed to the output CSV before their ID is appended to
+completed.log, so on resume the CSV is truncated back to the last recorded
+offset (dropping any half-written row) and only the remaining comments are
+fetched and extracted.
+
+A journal is only usable by one harvest at a time. Creating or opening one
+takes an exclusive lock on "<docket>.lock" next to it, held until close();
+the OS drops the lock if the harvesting process dies, so a crashed harvest
+can still be resumed while a live one (another web job or the CLI) cannot be
+taken over or restarted underneath it.
+"""
+import json
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from delta_sync import STATE_DIR, check_docket_id
+
+
+class HarvestInProgress(Exception):
+    """Another harvest of the docket holds its journal"""
+
+
+def journal_dir(docket_id, state_dir=STATE_DIR):
+    return os.path.join(state_dir, f"{check_docket_id(docket_id)}.checkpoint")
+
+
+def has_checkpoint(docket_id, state_dir=STATE_DIR):
+    return os.path.exists(os.path.join(journal_dir(docket_id, state_dir), "meta.json"))
+
+
+def _lock_docket(docket_id, state_dir):
+    """Take the docket's harvest lock without waiting; returns the open lock file"""
+    os.makedirs(state_dir, exist_ok=True)
+    lock_file = open(os.path.join(state_dir, f"{check_docket_id(docket_id)}.lock"), "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        raise HarvestInProgress(f"Docket {docket_id} is already being harvested")
+    return lock_file
+
+
+class HarvestJournal:
+    """Progress journal for one docket harvest"""
+
+    def __init__(self, path, lock_file=None):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._log = None
+        self._lock_file = lock_file
+
+    @property
+    def docket_id(self):
+        return self.meta["docket_id"]
+
+    @property
+    def output_file(self):
+        return self.meta["output_file"]
+
+    @classmethod
+    def create(cls, docket_id, comments, output_file, state_dir=STATE_DIR):
+        """Start a new journal, replacing any unfinished one for the docket
+
+        Raises HarvestInProgress if another harvest of the docket is running.
+        """
+        lock_file = _lock_docket(docket_id, state_dir)
+        try:
+            path = journal_dir(docket_id, state_dir)
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+            with open(os.path.join(path, "listed.jsonl"), "w", encoding="utf-8") as f:
+                for comment in comments:
+                    f.write(json.dumps(comment) + "\n")
+            open(os.path.join(path, "completed.log"), "w").close()
+            # meta.json is written last; its presence marks a usable journal
+            with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"docket_id": docket_id, "output_file": output_file, "listed": len(comments)}, f)
+            return cls(path, lock_file)
+        except BaseException:
+            lock_file.close()
+            raise
+
+    @classmethod
+    def open(cls, docket_id, state_dir=STATE_DIR):
+        """Return the unfinished journal for a docket, or None
+
+        Raises HarvestInProgress if another harvest is still writing it.
+        """
+        if not has_checkpoint(docket_id, state_dir):
+            return None
+        lock_file = _lock_docket(docket_id, state_dir)
+        # The harvest that held the lock may have finished in the meantime
+        if not has_checkpoint(docket_id, state_dir):
+            lock_file.close()
+            return None
+        return cls(journal_dir(docket_id, state_dir), lock_file)
+
+    def listed(self):
+        with open(os.path.join(self.path, "listed.jsonl"), encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def progress(self):
+        """Return (set of completed comment IDs, CSV byte offset after the last one)"""
+        completed = set()
+        offset = 0
+        with open(os.path.join(self.path, "completed.log"), encoding="utf-8") as f:
+            for line in f:
+                # A line without its newline was cut off mid-write; ignore it
+                if not line.endswith("\n"):
+                    break
+                comment_id, line_offset = line.rstrip("\n").split("\t")
+                completed.add(comment_id)
+                offset = int(line_offset)
+        return completed, offset
+
+    def record(self, comment_id, offset):
+        """Mark a comment as written; offset is the CSV size including its row"""
+        if self._log is None:
+            self._log = open(os.path.join(self.path, "completed.log"), "a", encoding="utf-8")
+        self._log.write(f"{comment_id}\t{offset}\n")
+        self._log.flush()
+
+    def _close_log(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def close(self):
+        """Stop journaling and release the docket's harvest lock"""
+        self._close_log()
+        if self._lock_file is not None:
+            # Closing the file releases the lock
+            self._lock_file.close()
+            self._lock_file = None
+
+    def finish(self):
+        """Delete the journal once the harvest has completed; call close() afterwards"""
+        self._close_log()
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,328 @@
+"""Hand comments to the classifier and get results back without shared files
+
+The classifier's own entry points work on files in the current directory:
+load_comments_csv() is given a CSV path and save_results() writes
+classified_comments.csv to cwd, so concurrent runs had to copy their input
+there and race to rename the output. classify() instead feeds the classifier
+a DataFrame, an open file handle or a CSV path in place, and returns the
+results as a DataFrame which the caller can keep in memory or write to a path
+of its choosing (e.g. the session folder).
+
+classify_docket() runs a whole session's CSV into its results folder. It
+first groups near-duplicate comments (form-letter campaigns) and classifies
+only one representative per cluster, copying its labels to the other members
+and adding cluster_id and cluster_size columns. In streaming mode, for very
+large dockets, representatives are read in fixed-size chunks and classified
+in a pool of worker processes (one per core, each holding its own loaded
+model), and results are appended to disk as they arrive, so memory stays
+bounded by the chunk size rather than the docket size.
+"""
+import inspect
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dedupe import NearDuplicateIndex
+from model_registry import ModelRegistry, MODEL_PATH
+from result_cache import text_key
+from results_store import ResultsWriter
+
+RESULT_COLUMN = "Substantive"
+CLUSTER_COLUMNS = ["cluster_id", "cluster_size"]
+# Classifier outputs that describe a comment's meaning; cluster members take
+# their representative's values
+LABEL_COLUMNS = ["Substantive", "Confidence", "Reason"]
+# Classifier outputs derived from a row's own text, recomputed for every row
+ROW_FEATURES = {"Comment_Length": len}
+# Comments classified per task in streaming mode
+CHUNK_ROWS = 2000
+CLASSIFY_WORKERS = os.cpu_count() or 2
+# Dockets at least this large are classified in streaming mode
+STREAMING_MIN_ROWS = 20000
+
+# spawn avoids forking a parent that has harvest and job threads running
+_context = multiprocessing.get_context("spawn")
+_worker_models = None
+_worker_rule_features = None
+# Only used when a classifier can neither expose its results nor save them to a given path
+_cwd_results_lock = threading.Lock()
+
+
+def load_comments(classifier, source):
+    """Load comments from a DataFrame, file handle or CSV path; returns the comment column or None"""
+    if isinstance(source, pd.DataFrame):
+        buffer = io.StringIO()
+        source.to_csv(buffer, index=False)
+        buffer.seek(0)
+        source = buffer
+    return classifier.load_comments_csv(source)
+
+
+def results_frame(classifier, private_cwd=False):
+    """Return the classifier's results as a DataFrame, read from memory when possible
+
+    private_cwd=True is for single-threaded worker processes: a classifier
+    that can only write to cwd does so in a temporary directory of its own,
+    since a thread lock can't keep separate processes off the shared file.
+    """
+    for value in vars(classifier).values():
+        if isinstance(value, pd.DataFrame) and RESULT_COLUMN in value.columns:
+            return value.copy()
+
+    if len(inspect.signature(classifier.save_results).parameters) > 0:
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        try:
+            classifier.save_results(path)
+            return pd.read_csv(path)
+        finally:
+            os.remove(path)
+
+    if private_cwd:
+        previous = os.getcwd()
+        with tempfile.TemporaryDirectory() as folder:
+            # cwd is per process, and this process runs one classification at a time
+            os.chdir(folder)
+            try:
+                classifier.save_results()
+                return pd.read_csv("classified_comments.csv")
+            finally:
+                os.chdir(previous)
+
+    # Last resort for classifiers that can only write to cwd: serialize the write-read
+    with _cwd_results_lock:
+        classifier.save_results()
+        try:
+            return pd.read_csv("classified_comments.csv")
+        finally:
+            os.remove("classified_comments.csv")
+
+
+def classify(classifier, source, rule_features, output_path=None, private_cwd=False):
+    """Classify comments from a DataFrame, file handle or CSV path; returns the results
+
+    With output_path the results are also written there as CSV. See
+    results_frame() for private_cwd.
+    """
+    if load_comments(classifier, source) is None:
+        raise RuntimeError('Error loading comments from CSV')
+    if not classifier.classify_comments(rule_features):
+        raise RuntimeError('Error classifying comments')
+    results = results_frame(classifier, private_cwd)
+    if output_path is not None:
+        results.to_csv(output_path, index=False)
+    return results
+
+
+def _init_worker(factory, model_path, rule_features):
+    """Load the model once per worker process"""
+    global _worker_models, _worker_rule_features
+    # The apps import the classifier's classes into __main__ because the model
+    # pickle refers to them there; a spawned worker needs the same aliases
+    main = sys.modules["__main__"]
+    for name, value in vars(sys.modules[factory.__module__]).items():
+        if isinstance(value, type) and not hasattr(main, name):
+            setattr(main, name, value)
+    _worker_models = ModelRegistry(factory, model_path, check_interval=float("inf"))
+    _worker_models.preload()
+    _worker_rule_features = rule_features
+
+
+def _classify_chunk(chunk):
+    classifier, _ = _worker_models.get()
+    return classify(classifier, chunk, _worker_rule_features, private_cwd=True)
+
+
+def _iter_csv_chunks(csv_path, chunk_rows, usecols=None):
+    """Yield chunks of a comment CSV indexed by row position"""
+    start = 0
+    for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunk_rows, usecols=usecols):
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def _aligned(results, chunk):
+    """Index classifier results by the row positions of the comments they came from"""
+    if len(results) != len(chunk):
+        raise RuntimeError(f'Classifier returned {len(results)} rows for {len(chunk)} comments')
+    results.index = chunk.index
+    return results
+
+
+def cluster_comments(csv_path, chunk_rows=CHUNK_ROWS):
+    """Group near-duplicate comments; returns (NearDuplicateIndex, {representative position: id})"""
+    index = NearDuplicateIndex()
+    representative_ids = {}
+    for chunk in _iter_csv_chunks(csv_path, chunk_rows, usecols=['id', 'comment']):
+        for position, comment_id, text in zip(chunk.index, chunk['id'], chunk['comment']):
+            if index.add(text) == position:
+                representative_ids[position] = comment_id
+    return index, representative_ids
+
+
+def iter_classified_chunks(chunks, rule_features, factory, model_path=MODEL_PATH, workers=CLASSIFY_WORKERS):
+    """Yield (chunk, results) for DataFrame chunks classified across worker processes"""
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_context, initializer=_init_worker,
+                             initargs=(factory, model_path, rule_features)) as executor:
+        # Bounded window of chunks in flight, yielded in input order
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append((chunk, executor.submit(_classify_chunk, chunk)))
+                if len(pending) >= workers * 2:
+                    chunk, future = pending.popleft()
+                    yield chunk, _aligned(future.result(), chunk)
+            while pending:
+                chunk, future = pending.popleft()
+                yield chunk, _aligned(future.result(), chunk)
+        finally:
+            # Abandoned early (error or cancelled job): don't classify the rest
+            for _, future in pending:
+                future.cancel()
+
+
+def classify_docket(csv_path, rule_features, folder, classifier=None, factory=None, model_path=MODEL_PATH,
+                    streaming=False, deduplicate=True, cache=None, cache_key=None,
+                    chunk_rows=CHUNK_ROWS, workers=CLASSIFY_WORKERS, progress=None):
+    """Classify a comment CSV into folder's results files; returns the results summary
+
+    Without streaming all representatives go through `classifier` in one call;
+    with streaming they are classified in chunks by worker processes built
+    from `factory`. With a ClassificationCache, texts already scored under
+    cache_key (a (model version, rule hash) pair) are not classified again.
+    progress, if given, is called as progress(message, fraction).
+    """
+    def report(message, fraction):
+        print(message)
+        if progress is not None:
+            progress(message, fraction)
+
+    index = None
+    extra = {}
+    if deduplicate:
+        try:
+            index, representative_ids = cluster_comments(csv_path, chunk_rows)
+        except ValueError as e:
+            # e.g. an input without id/comment columns; classify every row instead
+            print(f"Skipping near-duplicate clustering: {str(e)}")
+    if index is not None:
+        stats = extra['clusters'] = index.stats()
+        report(f"Collapsed {stats['comments']} comments into {stats['clusters']} clusters "
+               f"(largest has {stats['largest']} comments)", 0.1)
+    if cache is not None and cache_key is None:
+        cache = None
+
+    # Labels (classifier output columns not in the input) per representative
+    # row position, from the cache or the classifier
+    labels = []
+    label_columns = None
+    output_columns = None
+
+    to_classify = index.stats()['clusters'] if index is not None else None
+    done = 0
+    cache_hits = cache_lookups = 0
+
+    def uncached(chunks):
+        """Pass through the comments the cache can't answer, recording the ones it can"""
+        nonlocal label_columns, done, cache_hits, cache_lookups
+        for chunk in chunks:
+            if cache is not None and 'comment' in chunk.columns:
+                keys = pd.Series([text_key(*cache_key, text) for text in chunk['comment']], index=chunk.index)
+                found = cache.lookup_many(keys)
+                hit = keys.isin(list(found))
+                cache_lookups += len(keys)
+                cache_hits += int(hit.sum())
+                if hit.any():
+                    cached = pd.DataFrame([found[key] for key in keys[hit]], index=keys[hit].index)
+                    if label_columns is None:
+                        label_columns = list(cached.columns)
+                    labels.append(cached.reindex(columns=label_columns))
+                    done += int(hit.sum())
+                chunk = chunk[~hit]
+            if len(chunk):
+                yield chunk
+
+    def representative_chunks():
+        for chunk in _iter_csv_chunks(csv_path, chunk_rows):
+            if index is not None:
+                chunk = chunk[[index.is_representative(position) for position in chunk.index]]
+            if len(chunk):
+                yield chunk
+
+    def classified():
+        chunks = uncached(representative_chunks())
+        if streaming:
+            yield from iter_classified_chunks(chunks, rule_features, factory, model_path, workers)
+            return
+        chunks = list(chunks)
+        if chunks:
+            comments = pd.concat(chunks)
+            yield comments, _aligned(classify(classifier, comments, rule_features), comments)
+
+    for chunk, results in classified():
+        if output_columns is None:
+            output_columns = list(results.columns)
+            new_columns = [column for column in output_columns if column not in chunk.columns]
+            label_columns = new_columns if label_columns is None else label_columns + [
+                column for column in new_columns if column not in label_columns]
+        chunk_labels = results.reindex(columns=label_columns)
+        labels.append(chunk_labels)
+        if cache is not None and 'comment' in chunk.columns:
+            records = json.loads(chunk_labels.to_json(orient='records'))
+            cache.store_many(zip((text_key(*cache_key, text) for text in chunk['comment']), records))
+        done += len(chunk)
+        report(f"Classified {done}/{to_classify or '?'} comments",
+               0.1 + 0.8 * done / to_classify if to_classify else None)
+
+    if cache is not None:
+        extra['result_cache'] = {
+            'hits': cache_hits,
+            'misses': cache_lookups - cache_hits,
+            'hit_rate': round(cache_hits / cache_lookups, 3) if cache_lookups else None,
+        }
+        print(f"Classification cache: {cache_hits} of {cache_lookups} comments already classified; "
+              f"cache totals {cache.stats()}")
+
+    writer = ResultsWriter(folder)
+    try:
+        if labels:
+            labels = pd.concat(labels)
+            # Every row takes the labels of its cluster's representative (itself
+            # when not deduplicating), in the original row order
+            for chunk in _iter_csv_chunks(csv_path, chunk_rows):
+                if index is not None:
+                    representatives = [index.cluster_of[position] for position in chunk.index]
+                else:
+                    representatives = list(chunk.index)
+                if output_columns is None:
+                    # Everything came from the cache
+                    output_columns = list(chunk.columns) + [c for c in label_columns if c not in chunk.columns]
+                chunk_labels = labels.loc[representatives]
+                for column in label_columns:
+                    if column in ROW_FEATURES and 'comment' in chunk.columns:
+                        chunk[column] = chunk['comment'].map(ROW_FEATURES[column])
+                    elif column in LABEL_COLUMNS:
+                        chunk[column] = chunk_labels[column].to_numpy()
+                    else:
+                        # Other outputs can't be assumed to carry over; only
+                        # rows the classifier actually saw keep theirs
+                        chunk[column] = labels[column].reindex(chunk.index).to_numpy()
+                columns = output_columns
+                if index is not None:
+                    chunk['cluster_id'] = [representative_ids[position] for position in representatives]
+                    chunk['cluster_size'] = [index.sizes[position] for position in representatives]
+                    columns = output_columns + CLUSTER_COLUMNS
+                writer.write(chunk.reindex(columns=columns))
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close(extra)
@@ -0,0 +1,110 @@
+"""Near-duplicate (form letter) clustering with MinHash and LSH
+
+Mass-mail campaigns produce thousands of comments that are the same template
+with small edits. Each comment's normalized text is reduced to a MinHash
+signature of its word shingles; locality-sensitive hashing over bands of the
+signature finds candidate pairs, and a candidate joins a cluster when the
+estimated Jaccard similarity with the cluster's representative (its first
+comment) is at least SIMILARITY_THRESHOLD. Exact copies are matched by hash
+before any MinHash work. Only cluster representatives keep a signature, so
+the index can be fed chunk by chunk and grows with distinct letters.
+"""
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+from textnorm import normalize_text
+
+NUM_PERM = 128
+# 32 bands of 4 rows: pairs above ~0.45 similarity usually share a bucket,
+# and every candidate is then checked against SIMILARITY_THRESHOLD
+LSH_BANDS = 32
+SIMILARITY_THRESHOLD = 0.8
+SHINGLE_WORDS = 5
+# Shingles hashed per numpy block, bounding memory for very long attachments
+SHINGLE_BLOCK = 8192
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+WORD_RE = re.compile(r"\w+")
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+
+def shingle_hashes(text):
+    """32-bit hashes of the text's overlapping word shingles"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in set(shingles)),
+                       dtype=np.uint64)
+
+
+def minhash(text):
+    """MinHash signature (NUM_PERM uint32 values) of a text"""
+    hashes = shingle_hashes(text)
+    signature = np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), SHINGLE_BLOCK):
+        block = hashes[start:start + SHINGLE_BLOCK]
+        # (a * x + b) mod p stays below 2**64 because a, b < 2**31 and x < 2**32
+        permuted = ((np.outer(_PERM_A, block) + _PERM_B[:, None]) % _PRIME) & _MAX_HASH
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """Assigns each added text to a cluster, in the order texts are added"""
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, bands=LSH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = NUM_PERM // bands
+        self.cluster_of = []      # position -> representative position
+        self.sizes = {}           # representative position -> member count
+        self._signatures = {}     # representative position -> signature
+        self._buckets = [{} for _ in range(bands)]
+        self._exact = {}
+
+    def add(self, text):
+        """Add one text; returns the position of its cluster's representative"""
+        position = len(self.cluster_of)
+        text = normalize_text(text)
+        digest = hashlib.sha1(text.encode("utf-8")).digest()
+        representative = self._exact.get(digest)
+        if representative is None:
+            representative = self._match(position, minhash(text))
+            self._exact[digest] = representative
+        self.cluster_of.append(representative)
+        self.sizes[representative] = self.sizes.get(representative, 0) + 1
+        return representative
+
+    def _match(self, position, signature):
+        keys = [signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes()
+                for band in range(self.bands)]
+        checked = set()
+        for band, key in enumerate(keys):
+            candidate = self._buckets[band].get(key)
+            if candidate is None or candidate in checked:
+                continue
+            checked.add(candidate)
+            if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                return candidate
+        # A new cluster; only representatives are indexed, so memory grows
+        # with the number of distinct letters, not with the comment count
+        self._signatures[position] = signature
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, position)
+        return position
+
+    def is_representative(self, position):
+        return self.cluster_of[position] == position
+
+    def stats(self):
+        return {"comments": len(self.cluster_of), "clusters": len(self.sizes),
+                "largest": max(self.sizes.values(), default=0)}
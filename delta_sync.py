@@ -0,0 +1,120 @@
+"""High-water-mark bookkeeping for incremental docket harvests
+
+After each harvest we remember, per docket, the newest lastModifiedDate seen in
+the comment listings and the IDs of the comments that carry exactly that
+timestamp. The next run only lists comments modified at or after the mark,
+drops the ones already seen at the boundary, and merges the fresh rows into the
+existing output file (updated comments replace their old row).
+"""
+import csv
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+STATE_DIR = "harvest_state"
+# Docket IDs name files under STATE_DIR, so nothing path-like gets through
+DOCKET_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+# regulations.gov filters on Eastern time; shifting the UTC mark back by the
+# largest Eastern offset never misses a comment, and extras are filtered locally
+EASTERN_OFFSET = timedelta(hours=5)
+
+
+def valid_docket_id(docket_id):
+    return bool(docket_id) and DOCKET_ID_RE.match(docket_id) is not None
+
+
+def check_docket_id(docket_id):
+    """Raise ValueError unless docket_id is safe to use in a file name"""
+    if not valid_docket_id(docket_id):
+        raise ValueError(f"Invalid docket ID: {docket_id!r}")
+    return docket_id
+
+
+def state_path(docket_id, state_dir=STATE_DIR):
+    return os.path.join(state_dir, f"{check_docket_id(docket_id)}.json")
+
+
+def load_state(docket_id, state_dir=STATE_DIR):
+    """Return the saved sync state for a docket, or None if it was never harvested"""
+    path = state_path(docket_id, state_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(docket_id, state, state_dir=STATE_DIR):
+    os.makedirs(state_dir, exist_ok=True)
+    path = state_path(docket_id, state_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def modified_since_filter(high_water):
+    """Format a UTC high-water mark for the filter[lastModifiedDate][ge] parameter"""
+    mark = datetime.strptime(high_water[:19], "%Y-%m-%dT%H:%M:%S")
+    return (mark - EASTERN_OFFSET).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def last_modified(comment):
+    return comment.get("attributes", {}).get("lastModifiedDate") or ""
+
+
+def filter_new_comments(comments, state):
+    """Drop listed comments that are not newer than the saved high-water mark"""
+    if not state or not state.get("high_water"):
+        return list(comments)
+    high_water = state["high_water"]
+    boundary_ids = set(state.get("boundary_ids", []))
+    new_comments = []
+    for comment in comments:
+        modified = last_modified(comment)
+        if modified > high_water or (modified == high_water and comment.get("id") not in boundary_ids):
+            new_comments.append(comment)
+    return new_comments
+
+
+def advance_state(state, docket_id, comments, output_file):
+    """Return a new state whose high-water mark covers `comments`"""
+    state = dict(state or {}, docket_id=docket_id, output_file=output_file)
+    high_water = state.get("high_water") or ""
+    boundary_ids = set(state.get("boundary_ids", []))
+    for comment in comments:
+        modified = last_modified(comment)
+        if modified > high_water:
+            high_water = modified
+            boundary_ids = {comment.get("id")}
+        elif modified and modified == high_water:
+            boundary_ids.add(comment.get("id"))
+    state["high_water"] = high_water
+    state["boundary_ids"] = sorted(boundary_ids)
+    state["last_sync"] = datetime.now().isoformat(timespec="seconds")
+    return state
+
+
+def merge_rows_into_csv(filename, rows, fields):
+    """Merge rows into an existing CSV by id: replace updated rows, append new ones"""
+    merged = {}
+    if os.path.exists(filename):
+        # Rows carry full attachment text, far beyond csv's default field limit
+        csv.field_size_limit(sys.maxsize)
+        with open(filename, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                merged[row["id"]] = row
+    added = 0
+    for row in rows:
+        if row["id"] not in merged:
+            added += 1
+        merged[row["id"]] = row
+
+    tmp_path = filename + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(merged.values())
+    os.replace(tmp_path, filename)
+    return added, len(rows) - added
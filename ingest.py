@@ -0,0 +1,168 @@
+"""Offline ingestion of pre-downloaded comment exports
+
+Reads a CSV or TSV export in fixed-size chunks, maps its columns onto the
+harvester's schema (id, title, comment, postedDate, documentType,
+fromAttachment, hasAttachment), normalizes the text and writes a comment CSV
+that classification can use directly, without any API calls. Both our own
+harvest files and regulations.gov bulk downloads ("Document ID", "Comment",
+"Posted Date", ...) are accepted. With --rule the ingested comments are then
+classified against that rule PDF, writing the same results files as the web
+app.
+
+Usage: python ingest.py EXPORT [-o OUTPUT.csv] [--chunk-rows N] [--rule PDF [--results-dir DIR]]
+"""
+import argparse
+import os
+import re
+import sys
+
+import pandas as pd
+
+from newcommentbuilder import COMMENT_FIELDS
+from textnorm import normalize_column
+
+CHUNK_ROWS = 5000
+
+# Export header (lower-cased, punctuation stripped) -> harvester column
+COLUMN_ALIASES = {
+    "id": "id",
+    "documentid": "id",
+    "commentid": "id",
+    "title": "title",
+    "comment": "comment",
+    "commenttext": "comment",
+    "text": "comment",
+    "posteddate": "postedDate",
+    "documenttype": "documentType",
+    "fromattachment": "fromAttachment",
+    "hasattachment": "hasAttachment",
+    "attachmentfiles": "attachmentFiles",
+}
+REQUIRED_FIELDS = ["id", "comment"]
+
+
+def detect_delimiter(path):
+    """Tab for .tsv/.txt files or a tab in the header line, comma otherwise"""
+    if path.lower().endswith((".tsv", ".txt")):
+        return "\t"
+    with open(path, encoding="utf-8", errors="replace") as f:
+        header = f.readline()
+    return "\t" if "\t" in header else ","
+
+
+def map_columns(columns):
+    """Return {export column: harvester column} and raise if required fields are missing"""
+    mapping = {}
+    for column in columns:
+        key = re.sub(r"[^a-z]", "", str(column).lower())
+        target = COLUMN_ALIASES.get(key)
+        if target and target not in mapping.values():
+            mapping[column] = target
+    missing = [field for field in REQUIRED_FIELDS if field not in mapping.values()]
+    if missing:
+        raise ValueError(f"Export is missing required column(s): {', '.join(missing)} "
+                         f"(found: {', '.join(map(str, columns))})")
+    return mapping
+
+
+def _as_flag(series):
+    return series.astype(str).str.strip().str.lower().isin(["true", "1", "yes", "y"])
+
+
+def normalize_chunk(chunk, mapping):
+    """Rename, fill and clean one chunk of an export into the harvester schema"""
+    chunk = chunk.rename(columns=mapping)
+    out = pd.DataFrame(index=chunk.index)
+    out["id"] = chunk["id"].fillna("").astype(str).str.strip()
+    out["title"] = chunk["title"].fillna("") if "title" in chunk else ""
+    out["comment"] = normalize_column(chunk["comment"])
+    out["postedDate"] = chunk["postedDate"].fillna("") if "postedDate" in chunk else ""
+    out["documentType"] = chunk["documentType"].fillna("") if "documentType" in chunk else "Public Submission"
+    out["fromAttachment"] = _as_flag(chunk["fromAttachment"]) if "fromAttachment" in chunk else False
+    if "hasAttachment" in chunk:
+        out["hasAttachment"] = _as_flag(chunk["hasAttachment"])
+    elif "attachmentFiles" in chunk:
+        out["hasAttachment"] = chunk["attachmentFiles"].fillna("").astype(str).str.strip() != ""
+    else:
+        out["hasAttachment"] = False
+    return out[out["id"] != ""]
+
+
+def iter_export_chunks(path, chunk_rows=CHUNK_ROWS, sep=None):
+    """Yield normalized DataFrame chunks from an export, skipping repeated IDs"""
+    sep = sep or detect_delimiter(path)
+    reader = pd.read_csv(path, sep=sep, dtype=str, keep_default_na=False, chunksize=chunk_rows,
+                         encoding="utf-8", encoding_errors="replace", on_bad_lines="warn")
+    mapping = None
+    seen_ids = set()
+    for chunk in reader:
+        if mapping is None:
+            mapping = map_columns(chunk.columns)
+        chunk = normalize_chunk(chunk, mapping)
+        chunk = chunk[~chunk["id"].isin(seen_ids)].drop_duplicates("id")
+        seen_ids.update(chunk["id"])
+        yield chunk
+
+
+def ingest_export(path, output_path=None, chunk_rows=CHUNK_ROWS, sep=None):
+    """Convert an export into a harvester-format comment CSV; returns (output_path, row_count)"""
+    if output_path is None:
+        output_path = os.path.splitext(path)[0] + "_ingested.csv"
+    rows = 0
+    with open(output_path, "w", newline="", encoding="utf-8") as out:
+        header = True
+        for chunk in iter_export_chunks(path, chunk_rows, sep):
+            chunk.to_csv(out, index=False, header=header, columns=COMMENT_FIELDS)
+            header = False
+            rows += len(chunk)
+        if header:
+            # Empty export: still write a valid, empty comment file
+            pd.DataFrame(columns=COMMENT_FIELDS).to_csv(out, index=False)
+    print(f"Ingested {rows} comments from {path} into {output_path}")
+    return output_path, rows
+
+
+def classify_ingested(csv_path, pdf_path, folder, rows=None):
+    """Classify an ingested comment CSV against a rule PDF into folder; returns the results summary"""
+    # Only needed for classification, which loads (or trains) the model
+    import cc2
+    from classification import classify_docket, STREAMING_MIN_ROWS
+    from model_registry import ModelRegistry
+
+    # The model pickle refers to this class through __main__, as the apps import it
+    main = sys.modules["__main__"]
+    if not hasattr(main, "TextFeatureExtractor"):
+        main.TextFeatureExtractor = cc2.TextFeatureExtractor
+    classifier, _ = ModelRegistry(cc2.SubstantiveCommentClassifier).get()
+    rule_features = classifier.read_pdf(pdf_path)
+    if rule_features is None:
+        raise ValueError(f"Could not read the rule PDF {pdf_path}")
+    os.makedirs(folder, exist_ok=True)
+    summary = classify_docket(csv_path, rule_features, folder, classifier=classifier,
+                              factory=cc2.SubstantiveCommentClassifier,
+                              streaming=bool(rows and rows >= STREAMING_MIN_ROWS))
+    print(f"Classified {summary['total']} comments: {summary['substantive']} substantive, "
+          f"{summary['nonsubstantive']} non-substantive; results in {folder}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a downloaded comment export for classification")
+    parser.add_argument("export", help="CSV or TSV export of comments")
+    parser.add_argument("-o", "--output", help="output CSV path (default: <export>_ingested.csv)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows read per chunk")
+    parser.add_argument("--rule", metavar="PDF", help="classify the ingested comments against this rule PDF")
+    parser.add_argument("--results-dir", help="folder for classification results (default: <output>_results)")
+    args = parser.parse_args()
+    try:
+        output_path, rows = ingest_export(args.export, args.output, args.chunk_rows)
+        if args.rule:
+            folder = args.results_dir or os.path.splitext(output_path)[0] + "_results"
+            classify_ingested(output_path, args.rule, folder, rows)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Background jobs for long-running harvests and classifications
+
+A JobManager runs submitted functions on a bounded pool of worker threads and
+keeps their status, progress and result in memory so a web request can return
+immediately and the browser can poll for completion. Cancellation is
+cooperative: job functions call job.update() or job.check_cancelled()
+regularly, and these raise JobCancelled once cancel() has been requested.
+
+Jobs live in the memory of the process that created them, so the web app
+should run as a single (threaded) process when using them.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import JOBS_FINISHED
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION = 24 * 3600
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when its job has been cancelled"""
+
+
+class QueueFull(Exception):
+    """Raised by JobManager.submit when too many jobs are already waiting"""
+
+
+class Job:
+    """State of one background job, safe to read from request threads"""
+
+    def __init__(self, kind, owner=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+
+    def update(self, message=None, progress=None):
+        """Report progress (0.0-1.0) from inside the job; raises JobCancelled if cancelled"""
+        self.check_cancelled()
+        if message is not None:
+            self.message = message
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, float(progress)))
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "message": self.message,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobManager:
+    """Bounded worker pool with a capped queue of pending jobs"""
+
+    def __init__(self, max_workers=2, max_queued=10):
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, owner=None, **kwargs):
+        """Queue func(job, *args, **kwargs); its return value becomes job.result"""
+        with self._lock:
+            self._prune()
+            queued = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} jobs are already waiting, please try again later")
+            job = Job(kind, owner)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_requested:
+            job.status = CANCELLED
+            job.finished = time.time()
+            JOBS_FINISHED.labels(job.kind, job.status).inc()
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        job.message = "Starting..."
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = SUCCEEDED
+            job.progress = 1.0
+            job.message = "Done"
+        except JobCancelled:
+            job.status = CANCELLED
+            job.message = "Cancelled"
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            job.message = f"Failed: {e}"
+        finally:
+            job.finished = time.time()
+            JOBS_FINISHED.labels(job.kind, job.status).inc()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation; queued jobs never start, running ones stop at their next check"""
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return False
+        job._cancel.set()
+        if job.status == QUEUED:
+            job.message = "Cancelling..."
+        return True
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status in (QUEUED, RUNNING))
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,179 @@
+"""Quota-aware scheduling of regulations.gov API keys
+
+Each key gets a token bucket sized to its hourly quota so requests are spread
+across keys before the API has to answer with a 429. The buckets are corrected
+from the X-RateLimit-Remaining and Retry-After headers the API sends back.
+The pool is safe to share between threads, and acquire_async() lets asyncio
+code wait for a key without blocking the event loop.
+"""
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# api.data.gov keys are allowed 1,000 requests per rolling hour by default
+DEFAULT_HOURLY_LIMIT = 1000
+# Maximum number of requests a single key may send back to back
+DEFAULT_BURST = 10
+# How long to rest a key that reports no remaining quota and no Retry-After
+EXHAUSTED_COOLDOWN = 60.0
+
+
+def parse_retry_after(value):
+    """Convert a Retry-After header (seconds or HTTP date) to seconds from now"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ApiKeyState:
+    """Token bucket and quota bookkeeping for one API key"""
+
+    def __init__(self, key, hourly_limit, burst):
+        self.key = key
+        self.rate = hourly_limit / 3600.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.remaining = None
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.rate_limited = 0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.remaining == 0 and now >= self.blocked_until:
+            # The cooldown is over; trust the bucket until the API reports again
+            self.remaining = None
+        if self.remaining is not None:
+            self.tokens = min(self.tokens, float(self.remaining))
+
+    def wait_time(self, now):
+        """Seconds until this key can send another request"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ApiKeyPool:
+    """Thread-safe pool that hands out the API key with the most budget left"""
+
+    def __init__(self, keys, hourly_limit=DEFAULT_HOURLY_LIMIT, burst=DEFAULT_BURST):
+        if not keys:
+            raise ValueError("ApiKeyPool needs at least one API key")
+        self._lock = threading.Lock()
+        self._states = {key: ApiKeyState(key, hourly_limit, burst) for key in keys}
+
+    def __len__(self):
+        return len(self._states)
+
+    def try_acquire(self):
+        """Take a token from the best key without blocking
+
+        Returns (key, 0.0) on success, or (None, seconds) with the shortest wait
+        before any key becomes available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            best = None
+            shortest_wait = None
+            for state in self._states.values():
+                # refill() caps tokens at the API-reported remaining quota, so
+                # tokens compares keys with and without a reported quota alike
+                state.refill(now)
+                wait = state.wait_time(now)
+                if wait == 0:
+                    if best is None or state.tokens > best.tokens:
+                        best = state
+                elif shortest_wait is None or wait < shortest_wait:
+                    shortest_wait = wait
+            if best is None:
+                return None, shortest_wait
+            state = best
+            state.tokens -= 1
+            state.requests += 1
+            if state.remaining is not None:
+                state.remaining = max(0, state.remaining - 1)
+            return state.key, 0.0
+
+    def acquire(self, timeout=None):
+        """Block until a key is available and return it (None on timeout)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            key, wait = self.try_acquire()
+            if key:
+                return key
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return None
+            if wait > 5:
+                print(f"All API keys are out of quota, waiting {wait:.0f}s...")
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout=None):
+        """Asyncio version of acquire() that yields to the event loop while waiting"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            key, wait = self.try_acquire()
+            if key:
+                return key
+            if deadline is not None:
+                wait = min(wait, deadline - loop.time())
+                if wait <= 0:
+                    return None
+            await asyncio.sleep(wait)
+
+    def update_from_response(self, key, response):
+        """Record quota information from an API response sent with `key`"""
+        headers = response.headers
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            now = time.monotonic()
+            remaining = headers.get("X-RateLimit-Remaining")
+            if remaining is not None:
+                try:
+                    state.remaining = int(remaining)
+                except ValueError:
+                    pass
+            limit = headers.get("X-RateLimit-Limit")
+            if limit is not None:
+                try:
+                    state.rate = int(limit) / 3600.0
+                except ValueError:
+                    pass
+
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            if response.status_code == 429:
+                state.rate_limited += 1
+                state.tokens = 0.0
+                state.blocked_until = now + (retry_after if retry_after is not None else EXHAUSTED_COOLDOWN)
+            elif state.remaining == 0:
+                state.blocked_until = now + (retry_after if retry_after is not None else EXHAUSTED_COOLDOWN)
+
+    def stats(self):
+        """Per-key usage summary keyed by the first 8 characters of each key"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                state.key[:8]: {
+                    "requests": state.requests,
+                    "rate_limited": state.rate_limited,
+                    "remaining": state.remaining,
+                    "blocked_for": round(max(0.0, state.blocked_until - now), 1),
+                }
+                for state in self._states.values()
+            }
@@ -0,0 +1,285 @@
+"""In-process metrics exposed in the Prometheus text format
+
+A small, dependency-free registry of counters, gauges and histograms. The
+harvester, attachment pool, classifier and job manager update the metrics
+defined at the bottom of this module, and register_metrics_endpoint() adds a
+/metrics route that renders them for Prometheus to scrape.
+
+Values live in the memory of the process that records them. When the web app
+runs several worker processes, each one serves its own /metrics and Prometheus
+should scrape every worker (the `instance` label tells them apart).
+"""
+import math
+import threading
+import time
+
+# Latency buckets in seconds, from cached responses up to slow attachments
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base for a named metric with optional labels; children hold the values"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        """Return the child for these label values, creating it on first use"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_child()
+            return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels; call .labels() first")
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = float(value)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, or be read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, function):
+        """Report function() instead of a stored value (unlabelled gauges only)"""
+        self._function = function
+        self._default()
+
+    def _render_child(self, values, child):
+        if self._function is not None:
+            child.set(self._function())
+        return super()._render_child(values, child)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def time(self):
+        return _Timer(self.observe)
+
+
+class _Timer:
+    """Context manager that observes the elapsed wall time in seconds"""
+
+    def __init__(self, observe):
+        self._observe = observe
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, values, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics; asking for an existing name returns it"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Regulations.gov API
+API_REQUEST_SECONDS = REGISTRY.histogram(
+    "regulations_api_request_seconds", "Regulations.gov API request latency by endpoint", ["endpoint"])
+API_ERRORS = REGISTRY.counter(
+    "regulations_api_errors_total", "Non-200 API responses by key prefix and status code", ["key", "status"])
+API_RETRIES = REGISTRY.counter(
+    "regulations_api_retries_total", "API requests retried after an error or rate limit", ["endpoint"])
+API_CACHE_HITS = REGISTRY.counter(
+    "regulations_api_cache_hits_total", "API requests answered from the response cache", ["endpoint"])
+
+# Attachments
+ATTACHMENT_BYTES = REGISTRY.counter(
+    "attachment_download_bytes_total", "Bytes of attachments downloaded", ["extension"])
+ATTACHMENT_DOWNLOADS = REGISTRY.counter(
+    "attachment_downloads_total", "Attachment downloads by outcome", ["outcome"])
+ATTACHMENT_EXTRACTION_SECONDS = REGISTRY.histogram(
+    "attachment_extraction_seconds", "Time to extract text from one attachment", ["extension"])
+ATTACHMENT_EXTRACTION_FAILURES = REGISTRY.counter(
+    "attachment_extraction_failures_total", "Attachments whose extraction failed or timed out")
+
+# Classification
+COMMENTS_CLASSIFIED = REGISTRY.counter(
+    "comments_classified_total", "Comments classified")
+RESULT_CACHE_LOOKUPS = REGISTRY.counter(
+    "classification_cache_lookups_total", "Per-comment classification result cache lookups by result", ["result"])
+RULE_CACHE_LOOKUPS = REGISTRY.counter(
+    "rule_feature_cache_lookups_total", "Rule-PDF feature cache lookups by result", ["result"])
+CLASSIFICATION_SECONDS = REGISTRY.histogram(
+    "classification_run_seconds", "Time to classify one session's comments",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+
+# Background jobs
+JOBS_ACTIVE = REGISTRY.gauge(
+    "jobs_active", "Background jobs queued or running")
+JOBS_FINISHED = REGISTRY.counter(
+    "jobs_finished_total", "Background jobs finished by kind and final status", ["kind", "status"])
+
+
+def register_metrics_endpoint(app, registry=REGISTRY):
+    """Add a /metrics route serving the registry to a Flask app"""
+    from flask import Response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return metrics
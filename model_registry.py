@@ -0,0 +1,133 @@
+"""Process-wide registry for the substantive comment classifier
+
+The fitted model is unpickled (or trained, if the pickle is missing) once per
+process instead of on every request, warmed with a throwaway prediction so the
+first real request does not pay for lazy initialisation, and reloaded in the
+background when substantive_classifier_model.pkl changes on disk.
+
+Requests call get() and receive a shallow copy of the loaded classifier along
+with the version of the model it was copied from: the fitted models and
+vectorizers are shared read-only, while per-run state such as loaded comments
+and results lives on the copy. Calling preload() before a
+server forks its workers (e.g. gunicorn --preload) shares the loaded model
+between them through copy-on-write memory; gc.freeze() keeps the garbage
+collector from touching, and so copying, those pages.
+"""
+import copy
+import gc
+import os
+import threading
+import time
+
+MODEL_PATH = "substantive_classifier_model.pkl"
+# Seconds between checks of the model file's modification time
+RELOAD_CHECK_INTERVAL = 5.0
+WARMUP_TEXTS = ["Warm-up comment on the proposed rule's cost-benefit analysis."]
+
+
+def warm_up(classifier):
+    """Run a throwaway prediction through every fitted model the classifier holds"""
+    if hasattr(classifier, "warm_up"):
+        classifier.warm_up()
+        return
+    models = []
+    for value in vars(classifier).values():
+        candidates = value.values() if isinstance(value, dict) else [value]
+        models.extend(candidate for candidate in candidates if hasattr(candidate, "predict"))
+    for model in models:
+        try:
+            model.predict(WARMUP_TEXTS)
+        except Exception:
+            # Models that expect engineered features rather than raw text
+            # simply stay cold; warming is an optimisation only
+            pass
+
+
+class ModelRegistry:
+    """Loads a classifier once and hands out cheap per-request copies"""
+
+    def __init__(self, factory, model_path=MODEL_PATH, check_interval=RELOAD_CHECK_INTERVAL):
+        self.factory = factory
+        self.model_path = model_path
+        self.check_interval = check_interval
+        self._template = None
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self.loads = 0
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.model_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        """Build, load (or train and save) and warm a classifier"""
+        started = time.perf_counter()
+        classifier = self.factory()
+        if os.path.exists(self.model_path):
+            classifier.load_model()
+        else:
+            print(f"No model at {self.model_path}; training one (this happens once)")
+            if not classifier.load_training_data():
+                raise RuntimeError('Error loading training data')
+            classifier.train_models()
+            classifier.save_model()
+        warm_up(classifier)
+        self.loads += 1
+        print(f"Loaded classifier model in {time.perf_counter() - started:.1f}s")
+        return classifier, self._file_mtime()
+
+    def preload(self):
+        """Load the model now, e.g. at startup before workers fork"""
+        with self._lock:
+            if self._template is None:
+                self._template, self._mtime = self._load()
+                self._checked = time.monotonic()
+        # Loaded objects are long-lived; keep the collector off their pages
+        if hasattr(gc, "freeze"):
+            gc.freeze()
+
+    def _reload_in_background(self):
+        def reload():
+            try:
+                template, mtime = self._load()
+                with self._lock:
+                    self._template, self._mtime = template, mtime
+            except Exception as e:
+                print(f"Reloading the classifier model failed, keeping the old one: {str(e)}")
+            finally:
+                self._reloading = False
+
+        threading.Thread(target=reload, name="model-reload", daemon=True).start()
+
+    def _check_for_update(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        mtime = self._file_mtime()
+        with self._lock:
+            if mtime is None or mtime == self._mtime or self._reloading:
+                return
+            self._reloading = True
+        # Keep serving the current model until the new one is ready
+        print(f"{self.model_path} changed on disk; reloading the classifier model")
+        self._reload_in_background()
+
+    def get(self):
+        """Return (classifier, version): a per-request classifier sharing the loaded model
+        
+        The version identifies the model that classifier was copied from, for
+        keying caches of model-dependent results; both are read together so a
+        background reload can't pair one model's results with another's version.
+        """
+        if self._template is None:
+            self.preload()
+        else:
+            self._check_for_update()
+        with self._lock:
+            template, version = self._template, self._mtime
+        return copy.copy(template), version
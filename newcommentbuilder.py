@@ -1,13 +1,26 @@
-import requests
 import csv
+import hashlib
+import io
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
+import threading
 import tempfile
-import shutil
 from urllib.parse import urlparse
-import random
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import delta_sync
+import metrics
+from attachment_cache import AttachmentTextCache
+from attachment_pool import get_attachment_pool
+from checkpoint import HarvestJournal, has_checkpoint
+from keypool import ApiKeyPool
+from response_cache import ResponseCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, endpoint_type
+from search_index import CommentSearchIndex
+from textnorm import normalize_text
+from transport import http_get, transport_stats
 
 # Try importing optional packages for file processing
 PDF_SUPPORT = False
@@ -32,46 +45,106 @@ API_KEYS = [
     "Yspc7hIBVpC9qvBQpmJJzUUSlK4yzvFgs6d6uCr8",
     "ckxLZXWgdghbnxsZrsH8f93N6qw7MM2v9HFrYpXy"
 ]
-# Create a rotating queue of API keys
-API_KEY_QUEUE = deque(API_KEYS)
-CURRENT_API_KEY = API_KEY_QUEUE[0]
+# Shared, quota-aware scheduler for the API keys
+KEY_POOL = ApiKeyPool(API_KEYS)
+# Optional on-disk response cache, see enable_response_cache()
+RESPONSE_CACHE = None
+_attachment_cache = None
+_attachment_cache_lock = threading.Lock()
+_search_index = None
+_search_index_lock = threading.Lock()
 BASE_URL = "https://api.regulations.gov/v4"
+# Number of comment detail requests kept in flight while saving comments
+DETAIL_CONCURRENCY = 8
+# regulations.gov serves at most this many pages of this size for one query
+PAGE_SIZE = 250
+MAX_PAGES = 20
+# Concurrent requests used when listing a large document in date windows
+SHARD_CONCURRENCY = 8
+# Documents of a docket whose comments are listed at the same time
+DOCUMENT_CONCURRENCY = 4
+# Earliest date searched when sharding a document's comments by date
+SHARD_START = datetime(1995, 1, 1)
+# Times a date window's comment count is requested before the listing gives up
+WINDOW_COUNT_ATTEMPTS = 3
+# Parse attachments in worker processes (see attachment_pool); False parses inline
+USE_ATTACHMENT_POOL = True
+# Reuse extracted attachment text across comments and runs (see attachment_cache)
+USE_ATTACHMENT_CACHE = True
+# Index saved comments for full-text search as they are written (see search_index)
+USE_SEARCH_INDEX = True
+# Attachments larger than this are skipped without being downloaded
+MAX_ATTACHMENT_BYTES = 50 * 1024 * 1024
+# Attachments are buffered in memory up to this size and spilled to disk beyond it
+ATTACHMENT_SPOOL_BYTES = 8 * 1024 * 1024
+# Total seconds allowed for one attachment download
+ATTACHMENT_DOWNLOAD_TIMEOUT = 120
+# Leading bytes expected for each supported attachment type. A ".doc" can only
+# be read when it is really a DOCX (zip) package under the old extension
+FILE_SIGNATURES = {'.pdf': b'%PDF', '.docx': b'PK\x03\x04', '.doc': b'PK\x03\x04'}
+# Legacy binary Word files (OLE2 compound documents), which docx2txt can't read
+OLE2_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+# Columns of the comment CSV files
+COMMENT_FIELDS = ["id", "title", "comment", "postedDate", "documentType", "fromAttachment", "hasAttachment"]
 
-def get_headers():
-    """Get headers with the current API key"""
+def get_headers(api_key):
+    """Get headers for a request sent with the given API key"""
     return {
-        "X-Api-Key": CURRENT_API_KEY,
+        "X-Api-Key": api_key,
         "Accept": "application/json"
     }
 
-def rotate_api_key():
-    """Rotate to the next API key in the queue"""
-    global CURRENT_API_KEY
-    # Move the current key to the end of the queue
-    API_KEY_QUEUE.rotate(-1)
-    # Get the new current key from the front
-    CURRENT_API_KEY = API_KEY_QUEUE[0]
-    print(f"Rotating to next API key: {CURRENT_API_KEY[:8]}...")
-    return CURRENT_API_KEY
+def enable_response_cache(path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, ttls=None, offline=False):
+    """Serve API requests from a local SQLite cache; offline=True never calls the API"""
+    global RESPONSE_CACHE
+    RESPONSE_CACHE = ResponseCache(path, max_bytes=max_bytes, ttls=ttls, offline=offline)
+    print(f"Using response cache {path}{' (offline)' if offline else ''}")
+    return RESPONSE_CACHE
+
+def is_offline():
+    """True when requests may only be answered from the response cache"""
+    return RESPONSE_CACHE is not None and RESPONSE_CACHE.offline
+
+def api_endpoint_label(url):
+    """Metrics label for an API URL, e.g. 'comments list' or 'comments detail'"""
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    resource = parts[1] if len(parts) > 1 else "unknown"
+    return f"{resource} {endpoint_type(url)}"
 
 def make_api_request(url, params=None, max_retries=5):
-    """Make an API request with automatic key rotation on rate limit"""
+    """Make an API request, spreading load across keys from the key pool"""
+    endpoint = api_endpoint_label(url)
+    cache = RESPONSE_CACHE
+    if cache is not None:
+        cached = cache.get(url, params)
+        if cached is not None:
+            metrics.API_CACHE_HITS.labels(endpoint).inc()
+            return cached
+        if cache.offline:
+            return None
+    
     retries = 0
     while retries < max_retries:
-        headers = get_headers()
+        if retries:
+            metrics.API_RETRIES.labels(endpoint).inc()
+        api_key = KEY_POOL.acquire()
         try:
-            response = requests.get(url, params=params, headers=headers)
+            with metrics.API_REQUEST_SECONDS.labels(endpoint).time():
+                response = http_get(url, params=params, headers=get_headers(api_key))
+            KEY_POOL.update_from_response(api_key, response)
             
             # If successful, return the response
             if response.status_code == 200:
+                if cache is not None:
+                    cache.put(url, params, response)
                 return response
+            
+            metrics.API_ERRORS.labels(api_key[:8], response.status_code).inc()
                 
-            # If rate limited, rotate API key and retry
-            elif response.status_code == 429:
-                print(f"Rate limit reached for key {CURRENT_API_KEY[:8]}...")
-                rotate_api_key()
+            # If rate limited, the pool rests this key; retry with another one
+            if response.status_code == 429:
+                print(f"Rate limit reached for key {api_key[:8]}...")
                 retries += 1
-                time.sleep(1)  # Brief pause before retry
                 
             # For other errors, wait and retry
             else:
@@ -82,6 +155,7 @@ def make_api_request(url, params=None, max_retries=5):
                 
         except Exception as e:
             print(f"Exception making request: {str(e)}")
+            metrics.API_ERRORS.labels(api_key[:8], "exception").inc()
             retries += 1
             time.sleep(2)
     
@@ -115,14 +189,16 @@ def get_documents_for_docket(docket_id):
             break
             
         page += 1
-        # Be nice to the API with a small delay
-        time.sleep(0.1)
     
     print(f"Found {len(documents)} documents")
     return documents
 
-def get_comments_for_document(object_id):
-    """Get all comments for a specific document using its objectId"""
+def get_comments_for_document(object_id, modified_since=None):
+    """Get all comments for a specific document using its objectId
+    
+    If modified_since (a 'YYYY-MM-DD HH:MM:SS' Eastern time string) is given,
+    only comments posted or changed since then are listed.
+    """
     print(f"Getting comments for document object ID: {object_id}")
     comments = []
     page = 1
@@ -135,6 +211,9 @@ def get_comments_for_document(object_id):
             "page[number]": page,
             "sort": "postedDate"
         }
+        if modified_since:
+            params["filter[lastModifiedDate][ge]"] = modified_since
+            params["sort"] = "lastModifiedDate"
         
         response = make_api_request(url, params)
         
@@ -142,17 +221,21 @@ def get_comments_for_document(object_id):
             break
         
         data = response.json()
-        comments.extend(data.get("data", []))
-        
         meta = data.get("meta", {})
         total_elements = meta.get("totalElements", 0)
         
+        # Paging alone can't reach past MAX_PAGES; list large documents in date windows
+        if page == 1 and total_elements > PAGE_SIZE * MAX_PAGES:
+            print(f"  {total_elements} comments exceed the API page depth, listing by date window")
+            start = datetime.strptime(modified_since, API_DATE_FORMAT) if modified_since else None
+            return get_comments_for_document_sharded(object_id, start=start)
+        
+        comments.extend(data.get("data", []))
+        
         if not meta.get("hasNextPage", False):
             break
             
         page += 1
-        # Be nice to the API with a small delay
-        time.sleep(0.1)
         
         # Show progress for documents with many comments
         if total_elements > 250 and page % 5 == 0:
@@ -161,6 +244,134 @@ def get_comments_for_document(object_id):
     print(f"  Found {len(comments)} comments")
     return comments
 
+def get_comments_for_docket(docket_id, modified_since=None, concurrency=DOCUMENT_CONCURRENCY):
+    """List the comments on every document of a docket concurrently
+    
+    All requests share KEY_POOL's rate budget. Returns (comments, counts): one
+    de-duplicated list in document order, and the number of comments listed
+    for each document objectId.
+    """
+    documents = get_documents_for_docket(docket_id)
+    object_ids = []
+    for doc in documents:
+        object_id = doc.get("attributes", {}).get("objectId")
+        if object_id and object_id not in object_ids:
+            object_ids.append(object_id)
+    
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        listings = list(executor.map(lambda object_id: get_comments_for_document(object_id, modified_since),
+                                     object_ids))
+    
+    comments = []
+    counts = {}
+    seen_ids = set()
+    for object_id, document_comments in zip(object_ids, listings):
+        counts[object_id] = len(document_comments)
+        for comment in document_comments:
+            if comment.get("id") not in seen_ids:
+                seen_ids.add(comment.get("id"))
+                comments.append(comment)
+    
+    print(f"Found {len(comments)} unique comments across {len(object_ids)} documents")
+    return comments, counts
+
+API_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _window_params(object_id, start, end):
+    return {
+        "filter[commentOnId]": object_id,
+        "filter[lastModifiedDate][ge]": start.strftime(API_DATE_FORMAT),
+        "filter[lastModifiedDate][le]": end.strftime(API_DATE_FORMAT),
+        "sort": "lastModifiedDate,documentId",
+    }
+
+def count_comments_in_window(object_id, start, end):
+    """Number of comments on a document last modified between start and end (inclusive)"""
+    params = dict(_window_params(object_id, start, end), **{"page[size]": 5, "page[number]": 1})
+    response = make_api_request(f"{BASE_URL}/comments", params)
+    if not response:
+        return None
+    return response.json().get("meta", {}).get("totalElements", 0)
+
+def plan_comment_windows(object_id, start, end, executor):
+    """Split [start, end] into lastModifiedDate windows that each fit within MAX_PAGES
+    
+    Windows are counted concurrently, and any window still over the page-depth
+    limit is halved and counted again. Returns a list of (start, end, count).
+    A window that still can't be counted after WINDOW_COUNT_ATTEMPTS raises
+    RuntimeError, so an incomplete listing is never mistaken for a full one.
+    """
+    def count_window(window):
+        for attempt in range(WINDOW_COUNT_ATTEMPTS):
+            count = count_comments_in_window(object_id, *window)
+            if count is not None:
+                return count
+            if is_offline():
+                break
+        raise RuntimeError(f"Could not count comments between {window[0]} and {window[1]}")
+    
+    limit = PAGE_SIZE * MAX_PAGES
+    windows = []
+    pending = [(start, end)]
+    while pending:
+        counts = list(executor.map(count_window, pending))
+        next_pending = []
+        for (window_start, window_end), count in zip(pending, counts):
+            if count <= limit or window_end - window_start <= timedelta(seconds=1):
+                if count > limit:
+                    print(f"  Warning: {count} comments modified within one second, only {limit} can be listed")
+                if count:
+                    windows.append((window_start, window_end, count))
+            else:
+                middle = window_start + (window_end - window_start) / 2
+                middle = middle.replace(microsecond=0)
+                next_pending.append((window_start, middle))
+                next_pending.append((middle + timedelta(seconds=1), window_end))
+        pending = next_pending
+    windows.sort()
+    return windows
+
+def get_comments_for_document_sharded(object_id, start=None, end=None, concurrency=SHARD_CONCURRENCY):
+    """List every comment on a document by splitting it into lastModifiedDate windows
+    
+    Works past the API's page-depth limit and fetches all pages of all windows
+    concurrently. Comments seen in more than one window are returned once.
+    """
+    start = start or SHARD_START
+    end = end or datetime.now() + timedelta(days=1)
+    print(f"Getting comments for document object ID: {object_id} (sharded by date)")
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        windows = plan_comment_windows(object_id, start, end, executor)
+        print(f"  Split into {len(windows)} date windows")
+        
+        pages = []
+        for window_start, window_end, count in windows:
+            page_count = min(MAX_PAGES, (count + PAGE_SIZE - 1) // PAGE_SIZE)
+            for page in range(1, page_count + 1):
+                params = dict(_window_params(object_id, window_start, window_end),
+                              **{"page[size]": PAGE_SIZE, "page[number]": page})
+                pages.append(params)
+        
+        def fetch_page(params):
+            response = make_api_request(f"{BASE_URL}/comments", params)
+            if not response:
+                raise RuntimeError(f"Could not fetch page {params['page[number]']} of comments modified between "
+                                   f"{params['filter[lastModifiedDate][ge]']} and {params['filter[lastModifiedDate][le]']}")
+            return response.json().get("data", [])
+        
+        comments = []
+        seen_ids = set()
+        for page_comments in executor.map(fetch_page, pages):
+            for comment in page_comments:
+                if comment.get("id") not in seen_ids:
+                    seen_ids.add(comment.get("id"))
+                    comments.append(comment)
+    
+    expected = sum(count for _, _, count in windows)
+    print(f"  Found {len(comments)} comments ({expected} counted across windows)")
+    return comments
+
 def get_comment_details(comment_id):
     """Get detailed information for a specific comment"""
     url = f"{BASE_URL}/comments/{comment_id}"
@@ -171,6 +382,8 @@ def get_comment_details(comment_id):
         response = make_api_request(url, params)
         if response:
             return response.json()
+        if is_offline():
+            return None
         
         # Brief pause between attempts
         time.sleep(1)
@@ -178,20 +391,83 @@ def get_comment_details(comment_id):
     print(f"Failed to get details for comment {comment_id} after 3 attempts")
     return None
 
-def download_file(url, destination):
-    """Download a file from a URL to a local destination"""
+def fetch_attachment(url, extension, advertised_size=None, max_bytes=MAX_ATTACHMENT_BYTES,
+                     spool_bytes=ATTACHMENT_SPOOL_BYTES):
+    """Stream an attachment into memory, spilling to a temp file above spool_bytes
+    
+    Returns (payload, sha256) where payload is the file's bytes, or the path of
+    a temporary file the caller must delete. Returns (None, None) when the file
+    is too large, is not the expected format, or the download fails.
+    """
+    # The size comes from attachment metadata and may be missing or malformed;
+    # only a plain number is trusted, the streamed byte count is checked anyway
+    if str(advertised_size).isdigit() and int(advertised_size) > max_bytes:
+        print(f"  Skipping attachment of {advertised_size} bytes (limit {max_bytes}): {url}")
+        return None, None
+    
+    spill_path = None
+    spill = None
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
+        # Closing the response returns its connection to the shared pool
+        with http_get(url, stream=True) as response:
+            response.raise_for_status()
+            
+            length = response.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > max_bytes:
+                print(f"  Skipping attachment of {length} bytes (limit {max_bytes}): {url}")
+                return None, None
+            if "text/html" in response.headers.get("Content-Type", ""):
+                print(f"  Skipping attachment served as HTML: {url}")
+                return None, None
+            
+            deadline = time.monotonic() + ATTACHMENT_DOWNLOAD_TIMEOUT
+            digest = hashlib.sha256()
+            buffer = io.BytesIO()
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if not chunk:
+                    continue
+                if size == 0 and chunk.startswith(OLE2_SIGNATURE):
+                    print(f"  Skipping legacy Word (OLE2) attachment; only PDF and DOCX text "
+                          f"can be extracted: {url}")
+                    return None, None
+                if size == 0 and not chunk.startswith(FILE_SIGNATURES.get(extension, b'')):
+                    print(f"  Skipping attachment that is not a valid {extension} file: {url}")
+                    return None, None
+                size += len(chunk)
+                if size > max_bytes:
+                    print(f"  Stopped attachment download at {max_bytes} bytes: {url}")
+                    return None, None
+                if time.monotonic() > deadline:
+                    print(f"  Attachment download took longer than {ATTACHMENT_DOWNLOAD_TIMEOUT}s: {url}")
+                    return None, None
+                digest.update(chunk)
+                
+                if spill is None and size > spool_bytes:
+                    fd, spill_path = tempfile.mkstemp(suffix=extension)
+                    spill = os.fdopen(fd, 'wb')
+                    spill.write(buffer.getvalue())
+                    buffer = None
+                (spill or buffer).write(chunk)
         
-        with open(destination, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        return True
+        metrics.ATTACHMENT_BYTES.labels(extension).inc(size)
+        metrics.ATTACHMENT_DOWNLOADS.labels("ok").inc()
+        if spill is not None:
+            spill.close()
+            spill = None
+            payload, spill_path = spill_path, None
+            return payload, digest.hexdigest()
+        return buffer.getvalue(), digest.hexdigest()
     except Exception as e:
         print(f"Error downloading file: {str(e)}")
-        return False
+        metrics.ATTACHMENT_DOWNLOADS.labels("error").inc()
+        return None, None
+    finally:
+        # Only reached with a live spill file when the download was abandoned
+        if spill is not None:
+            spill.close()
+        if spill_path is not None:
+            os.remove(spill_path)
 
 def get_file_extension(url):
     """Extract file extension from URL"""
@@ -199,47 +475,115 @@ def get_file_extension(url):
     path = parsed_url.path
     return os.path.splitext(path)[1].lower()
 
-def clean_text(text):
-    """Clean extracted text to remove problematic characters"""
-    if not text:
-        return ""
-    
-    # Remove null bytes and other control characters except newlines and tabs
-    cleaned = ""
-    for char in text:
-        if char in ('\n', '\t', '\r') or (ord(char) >= 32 and ord(char) < 127):
-            cleaned += char
-    
-    return cleaned.strip()
+def clean_text(text, markup=True):
+    """Clean text: strip markup and entities (unless markup=False), remove control characters"""
+    return normalize_text(text, markup)
+
+def _as_stream(source):
+    """Parsers accept a file path or a file object; wrap raw bytes in a buffer"""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def read_pdf_text(source):
+    """Read the text of a PDF (path or bytes), raising on malformed input"""
+    reader = PyPDF2.PdfReader(_as_stream(source))
+    text = ""
+    for page_num in range(len(reader.pages)):
+        text += reader.pages[page_num].extract_text() + "\n"
+    return clean_text(text, markup=False)
+
+def read_docx_text(source):
+    """Read the text of a DOCX file (path or bytes), raising on malformed input"""
+    return clean_text(docx2txt.process(_as_stream(source)), markup=False)
 
 def extract_text_from_pdf(file_path):
-    """Extract text from a PDF file"""
+    """Extract text from a PDF file (path or bytes)"""
     if not PDF_SUPPORT:
         return ""
         
     try:
-        with open(file_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            text = ""
-            for page_num in range(len(reader.pages)):
-                text += reader.pages[page_num].extract_text() + "\n"
-            return clean_text(text)
+        return read_pdf_text(file_path)
     except Exception as e:
         print(f"Error extracting text from PDF: {str(e)}")
         return ""
 
 def extract_text_from_docx(file_path):
-    """Extract text from a DOCX file"""
+    """Extract text from a DOCX file (path or bytes)"""
     if not DOCX_SUPPORT:
         return ""
         
     try:
-        text = docx2txt.process(file_path)
-        return clean_text(text)
+        return read_docx_text(file_path)
     except Exception as e:
         print(f"Error extracting text from DOCX: {str(e)}")
         return ""
 
+def extract_attachment_text(source, extension, label=None):
+    """Extract text from a downloaded attachment (path or bytes), in the worker pool when enabled"""
+    if extension == '.pdf' and not PDF_SUPPORT:
+        return ""
+    if extension in ['.docx', '.doc'] and not DOCX_SUPPORT:
+        return ""
+    with metrics.ATTACHMENT_EXTRACTION_SECONDS.labels(extension).time():
+        if USE_ATTACHMENT_POOL:
+            return get_attachment_pool().extract(source, extension, label)
+        if extension == '.pdf':
+            return extract_text_from_pdf(source)
+        return extract_text_from_docx(source)
+
+def get_attachment_cache():
+    """Return the shared attachment text cache, or None when it is disabled"""
+    global _attachment_cache
+    if not USE_ATTACHMENT_CACHE:
+        return None
+    if _attachment_cache is None:
+        with _attachment_cache_lock:
+            if _attachment_cache is None:
+                _attachment_cache = AttachmentTextCache()
+    return _attachment_cache
+
+def get_search_index():
+    """Return the shared comment search index, or None when it is disabled"""
+    global _search_index
+    if not USE_SEARCH_INDEX:
+        return None
+    if _search_index is None:
+        with _search_index_lock:
+            if _search_index is None:
+                _search_index = CommentSearchIndex()
+    return _search_index
+
+def get_attachment_text(file_url, extension, advertised_size=None):
+    """Download and extract one attachment, reusing cached text for known URLs or contents"""
+    cache = get_attachment_cache()
+    if cache is not None:
+        text = cache.lookup_url(file_url)
+        if text is not None:
+            return text
+    
+    # Download the file into memory (or a temp file if it is large)
+    print(f"  Downloading attachment: {file_url}")
+    payload, content_hash = fetch_attachment(file_url, extension, advertised_size)
+    if payload is None:
+        print(f"  Failed to download attachment: {file_url}")
+        return ""
+    
+    try:
+        if cache is not None:
+            text = cache.lookup_content(file_url, content_hash)
+            if text is not None:
+                return text
+        
+        # Extract text based on file type
+        text = extract_attachment_text(payload, extension, file_url)
+    finally:
+        if isinstance(payload, str):
+            os.remove(payload)
+    
+    # Only keep real text; an empty result may be a timeout worth retrying later
+    if cache is not None and text:
+        cache.store(file_url, content_hash, text)
+    return text
+
 def process_attachments(comment_details):
     """Process attachments and extract text if possible"""
     if not comment_details:
@@ -253,118 +597,260 @@ def process_attachments(comment_details):
     if not included:
         return attachment_text, has_attachment
     
-    # Create a temporary directory for downloads
-    temp_dir = tempfile.mkdtemp()
-    
-    try:
-        for item in included:
-            if item.get("type") == "attachments":
-                file_formats = item.get("attributes", {}).get("fileFormats", [])
+    for item in included:
+        if item.get("type") == "attachments":
+            file_formats = item.get("attributes", {}).get("fileFormats", [])
+            
+            for file_format in file_formats:
+                file_url = file_format.get("fileUrl")
+                if not file_url:
+                    continue
                 
-                for file_format in file_formats:
-                    file_url = file_format.get("fileUrl")
-                    if not file_url:
-                        continue
-                    
-                    has_attachment = True
-                    extension = get_file_extension(file_url)
-                    
-                    if extension in ['.pdf', '.docx', '.doc']:
-                        # Create a temporary file
-                        temp_file = os.path.join(temp_dir, f"attachment{extension}")
-                        
-                        # Download the file
-                        print(f"  Downloading attachment: {file_url}")
-                        if download_file(file_url, temp_file):
-                            # Extract text based on file type
-                            if extension == '.pdf':
-                                text = extract_text_from_pdf(temp_file)
-                                if text:
-                                    attachment_text = text
-                                    break
-                            elif extension in ['.docx', '.doc']:
-                                text = extract_text_from_docx(temp_file)
-                                if text:
-                                    attachment_text = text
-                                    break
-                        else:
-                            print(f"  Failed to download attachment: {file_url}")
-    finally:
-        # Clean up the temporary directory
-        shutil.rmtree(temp_dir, ignore_errors=True)
+                has_attachment = True
+                extension = get_file_extension(file_url)
+                
+                if extension in ['.pdf', '.docx', '.doc']:
+                    text = get_attachment_text(file_url, extension, file_format.get("size"))
+                    if text:
+                        attachment_text = text
+                        break
     
     return attachment_text, has_attachment
 
-def save_comments_to_csv(comments, docket_id, extract_attachments=True):
-    """Save comments to a CSV file with attachment processing"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{docket_id.replace('-', '')}_comments_{timestamp}.csv"
+def build_comment_row(comment, extract_attachments=True):
+    """Fetch details for a listed comment and build its CSV row"""
+    comment_id = comment.get("id", "")
+    
+    # Start with data from the list response
+    comment_data = {
+        "id": comment_id,
+        "fromAttachment": False,
+        "hasAttachment": False
+    }
+    
+    # Get attributes from list response
+    list_attributes = comment.get("attributes", {})
+    
+    # Now get the detailed comment information for accurate text and attachment info
+    comment_details = get_comment_details(comment_id)
+    
+    # If we got details, use the detailed attributes, otherwise use list attributes
+    if comment_details:
+        attributes = comment_details.get("data", {}).get("attributes", {})
+    else:
+        attributes = list_attributes
+    
+    # Fill in metadata fields
+    comment_data["title"] = attributes.get("title", "")
+    comment_data["postedDate"] = attributes.get("postedDate", "")
+    comment_data["documentType"] = attributes.get("documentType", "")
     
-    print(f"Saving {len(comments)} comments to {filename}")
+    # Get comment text directly from the API response
+    comment_text = attributes.get("comment", "")
     
-    # Define fields for CSV output
-    fields = ["id", "title", "comment", "postedDate", "documentType", "fromAttachment", "hasAttachment"]
+    # Strip the HTML markup and entities the API leaves in comment bodies
+    comment_text = clean_text(comment_text)
     
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fields)
-        writer.writeheader()
+    # Process attachments if enabled
+    attachment_text = ""
+    if extract_attachments and comment_details:
+        attachment_text, has_attachment = process_attachments(comment_details)
+        comment_data["hasAttachment"] = has_attachment
         
-        for i, comment in enumerate(comments):
-            comment_id = comment.get("id", "")
-            print(f"Processing comment {i+1}/{len(comments)}: {comment_id}")
-            
-            # Start with data from the list response
-            comment_data = {
-                "id": comment_id,
-                "fromAttachment": False,
-                "hasAttachment": False
-            }
-            
-            # Get attributes from list response
-            list_attributes = comment.get("attributes", {})
-            
-            # Now get the detailed comment information for accurate text and attachment info
-            comment_details = get_comment_details(comment_id)
-            
-            # If we got details, use the detailed attributes, otherwise use list attributes
-            if comment_details:
-                attributes = comment_details.get("data", {}).get("attributes", {})
-            else:
-                attributes = list_attributes
-            
-            # Fill in metadata fields
-            comment_data["title"] = attributes.get("title", "")
-            comment_data["postedDate"] = attributes.get("postedDate", "")
-            comment_data["documentType"] = attributes.get("documentType", "")
-            
-            # Get comment text directly from the API response
-            comment_text = attributes.get("comment", "")
-            
-            # Make sure comment_text is not None (convert to empty string if None)
-            comment_text = comment_text if comment_text else ""
-            
-            # Process attachments if enabled
-            attachment_text = ""
-            if extract_attachments and comment_details:
-                attachment_text, has_attachment = process_attachments(comment_details)
-                comment_data["hasAttachment"] = has_attachment
-                
-                if attachment_text:
-                    # If we have both comment_text and attachment_text, use the longer one
-                    # This way we don't lose either source of information
-                    if len(attachment_text) > len(comment_text):
-                        comment_text = attachment_text
-                        comment_data["fromAttachment"] = True
-            
-            # Set the final comment text
-            comment_data["comment"] = comment_text
+        if attachment_text:
+            # If we have both comment_text and attachment_text, use the longer one
+            # This way we don't lose either source of information
+            if len(attachment_text) > len(comment_text):
+                comment_text = attachment_text
+                comment_data["fromAttachment"] = True
+    
+    # Set the final comment text
+    comment_data["comment"] = comment_text
+    return comment_data
+
+def iter_comment_rows(comments, extract_attachments=True, concurrency=DETAIL_CONCURRENCY):
+    """Yield CSV rows for comments in input order, fetching details concurrently
+    
+    Up to `concurrency` detail requests are in flight at once. A small window of
+    extra work is queued ahead so one slow comment does not idle the other workers,
+    but rows are always yielded in the same order as `comments`.
+    """
+    if concurrency <= 1:
+        for comment in comments:
+            yield build_comment_row(comment, extract_attachments)
+        return
+    
+    comment_iter = iter(comments)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque(
+            executor.submit(build_comment_row, comment, extract_attachments)
+            for comment in islice(comment_iter, concurrency * 2)
+        )
+        while pending:
+            row = pending.popleft().result()
+            next_comment = next(comment_iter, None)
+            if next_comment is not None:
+                pending.append(executor.submit(build_comment_row, next_comment, extract_attachments))
+            yield row
+
+def _write_comment_rows(csvfile, comments, extract_attachments, concurrency, journal=None, done=0, total=None,
+                        progress=None, docket_id=None):
+    """Fetch and write rows for comments, journaling each one after it is flushed
+    
+    With a docket_id each row is also added to the search index.
+    """
+    writer = csv.DictWriter(csvfile, fieldnames=COMMENT_FIELDS)
+    total = total if total is not None else len(comments)
+    search_index = get_search_index() if docket_id is not None else None
+    rows = iter_comment_rows(comments, extract_attachments, concurrency)
+    try:
+        for i, comment_data in enumerate(rows, start=done + 1):
+            print(f"Processed comment {i}/{total}: {comment_data['id']}")
             
             # Write the row to CSV
             writer.writerow(comment_data)
+            if search_index is not None:
+                search_index.add(docket_id, comment_data)
+            if journal is not None:
+                csvfile.flush()
+                journal.record(comment_data["id"], csvfile.tell())
+            if progress is not None:
+                progress(i, total)
+    finally:
+        if search_index is not None:
+            search_index.flush()
+
+def report_attachment_failures():
+    """Print attachments the worker pool gave up on (timeouts, crashes, memory)"""
+    if not USE_ATTACHMENT_POOL:
+        return
+    pool = get_attachment_pool()
+    failures, pool.failures = pool.failures, []
+    if failures:
+        print(f"{len(failures)} attachments could not be extracted:")
+        for failure in failures:
+            print(f"  {failure['file']}: {failure['reason']}")
+
+def save_comments_to_csv(comments, docket_id, extract_attachments=True, concurrency=DETAIL_CONCURRENCY,
+                         checkpoint=True, progress=None):
+    """Save comments to a CSV file with attachment processing
+    
+    With checkpoint=True progress is journaled so resume_harvest() can pick up
+    an interrupted run without re-fetching finished comments; HarvestInProgress
+    is raised if another harvest of the docket is running. progress, if
+    given, is called as progress(rows_done, total) after each row.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{docket_id.replace('-', '')}_comments_{timestamp}.csv"
+    
+    print(f"Saving {len(comments)} comments to {filename} ({concurrency} concurrent requests)")
+    
+    journal = HarvestJournal.create(docket_id, comments, filename) if checkpoint else None
+    try:
+        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=COMMENT_FIELDS)
+            writer.writeheader()
+            _write_comment_rows(csvfile, comments, extract_attachments, concurrency, journal, progress=progress,
+                                docket_id=docket_id)
+        if journal is not None:
+            journal.finish()
+    finally:
+        if journal is not None:
+            journal.close()
     
     print(f"Successfully saved comments to {filename}")
+    report_attachment_failures()
+    cache = get_attachment_cache()
+    if cache is not None:
+        cache_stats = cache.stats()
+        print(f"Attachment text cache: {cache_stats['url_hits']} URL hits, "
+              f"{cache_stats['content_hits']} content hits, {cache_stats['misses']} parsed")
+    stats = transport_stats()
+    print(f"HTTP connections: {stats['connections_opened']} opened, "
+          f"{stats['connections_reused']} reused over {stats['requests']} requests")
     return filename
 
+def resume_harvest(docket_id, extract_attachments=True, concurrency=DETAIL_CONCURRENCY, progress=None):
+    """Continue an interrupted save_comments_to_csv run for a docket
+    
+    Returns (filename, listed_comments), or None if there is nothing to resume.
+    Raises HarvestInProgress if another harvest of the docket is still running.
+    """
+    journal = HarvestJournal.open(docket_id)
+    if journal is None:
+        return None
+    
+    try:
+        comments = journal.listed()
+        completed, offset = journal.progress()
+        filename = journal.output_file
+        remaining = [comment for comment in comments if comment.get("id", "") not in completed]
+        print(f"Resuming harvest of {docket_id}: {len(completed)} of {len(comments)} comments "
+              f"already saved to {filename}")
+        
+        search_index = get_search_index()
+        if offset and os.path.exists(filename):
+            # Drop anything written after the last journaled row
+            with open(filename, 'r+b') as f:
+                f.truncate(offset)
+            mode = 'a'
+            if search_index is not None:
+                # Saved rows whose index batch was lost with the interrupted run
+                search_index.add_csv(docket_id, filename, skip_ids=search_index.indexed_ids(docket_id))
+        else:
+            mode = 'w'
+        with open(filename, mode, newline='', encoding='utf-8') as csvfile:
+            if mode == 'w':
+                csv.DictWriter(csvfile, fieldnames=COMMENT_FIELDS).writeheader()
+            _write_comment_rows(csvfile, remaining, extract_attachments, concurrency, journal,
+                                done=len(completed), total=len(comments), progress=progress, docket_id=docket_id)
+        journal.finish()
+    finally:
+        journal.close()
+    
+    print(f"Successfully saved comments to {filename}")
+    return filename, comments
+
+def record_harvest(docket_id, comments, output_file):
+    """Save the delta-sync high-water mark after harvesting `comments` into output_file"""
+    state = delta_sync.load_state(docket_id)
+    delta_sync.save_state(docket_id, delta_sync.advance_state(state, docket_id, comments, output_file))
+
+def sync_docket(docket_id, output_file=None, extract_attachments=True, concurrency=DETAIL_CONCURRENCY):
+    """Fetch only comments new or changed since the last harvest and merge them into its output
+    
+    Falls back to a full harvest when the docket has no saved state or its
+    output file is gone. Returns (output_file, number_of_comments_fetched).
+    """
+    state = delta_sync.load_state(docket_id)
+    output_file = output_file or (state or {}).get("output_file")
+    if not state or not output_file or not os.path.exists(output_file):
+        print(f"No previous harvest of {docket_id} found, fetching everything")
+        state = None
+    
+    modified_since = None
+    if state and state.get("high_water"):
+        modified_since = delta_sync.modified_since_filter(state["high_water"])
+        print(f"Fetching comments modified since {state['high_water']}")
+    
+    listed, _ = get_comments_for_docket(docket_id, modified_since)
+    
+    new_comments = delta_sync.filter_new_comments(listed, state)
+    if state is None:
+        output_file = save_comments_to_csv(new_comments, docket_id, extract_attachments, concurrency)
+    elif new_comments:
+        rows = list(iter_comment_rows(new_comments, extract_attachments, concurrency))
+        search_index = get_search_index()
+        if search_index is not None:
+            search_index.add_many(docket_id, rows)
+        added, updated = delta_sync.merge_rows_into_csv(output_file, rows, COMMENT_FIELDS)
+        print(f"Merged into {output_file}: {added} new, {updated} updated comments")
+    else:
+        print(f"No new comments for {docket_id} since the last harvest")
+    
+    record_harvest(docket_id, listed, output_file)
+    return output_file, len(new_comments)
+
 def check_dependencies():
     """Check if required packages are installed and print information"""
     print("\nDependency check:")
@@ -381,21 +867,23 @@ def check_dependencies():
 
 def main():
     print("=== Enhanced Regulations.gov Comment Extractor ===")
-    print(f"Loaded {len(API_KEYS)} API keys for rotation")
+    print(f"Loaded {len(KEY_POOL)} API keys into the key pool")
     check_dependencies()
     
-    # Randomize starting API key to distribute usage
-    random_start = random.randint(0, len(API_KEYS) - 1)
-    for _ in range(random_start):
-        rotate_api_key()
-    print(f"Starting with API key: {CURRENT_API_KEY[:8]}...")
-    
     # Prompt user for docket ID
-    docket_id = input("\nEnter the docket ID (e.g., FSIS-2010-0004): ")
+    docket_id = input("\nEnter the docket ID (e.g., FSIS-2010-0004): ").strip()
     
     if not docket_id:
         print("Docket ID is required.")
         return
+    if not delta_sync.valid_docket_id(docket_id):
+        print("Docket IDs may only contain letters, digits, '-' and '_'.")
+        return
+    
+    # Ask whether to use the local response cache
+    if input("Use the local response cache? (y/n): ").lower() == 'y':
+        offline = input("Work offline from the cache only? (y/n): ").lower() == 'y'
+        enable_response_cache(offline=offline)
     
     # Ask whether to extract text from attachments
     extract_attachments = True
@@ -403,27 +891,36 @@ def main():
         print("\nNOTE: No PDF or DOCX extraction libraries are installed.")
         extract_attachments = input("Do you want to try downloading attachments anyway? (y/n): ").lower() == 'y'
     
-    # 1. Get all documents for the docket
-    documents = get_documents_for_docket(docket_id)
+    # Offer to resume an interrupted harvest of this docket
+    if has_checkpoint(docket_id) and input("Resume the interrupted harvest of this docket? (y/n): ").lower() == 'y':
+        csv_file, comments = resume_harvest(docket_id, extract_attachments)
+        record_harvest(docket_id, comments, csv_file)
+        print(f"\nComment data saved to {csv_file}")
+        print("\nDone!")
+        return
     
-    if not documents:
-        print("No documents found for this docket ID.")
+    # Offer an incremental update if this docket was harvested before
+    previous = delta_sync.load_state(docket_id)
+    if previous and input(f"Only fetch comments new since the last harvest ({previous.get('last_sync')})? (y/n): ").lower() == 'y':
+        csv_file, fetched = sync_docket(docket_id, extract_attachments=extract_attachments)
+        print(f"\nFetched {fetched} new or updated comments into {csv_file}")
+        print("\nDone!")
         return
     
-    # 2. Get all comments for each document
-    all_comments = []
-    for doc in documents:
-        object_id = doc.get("attributes", {}).get("objectId")
-        if object_id:
-            document_comments = get_comments_for_document(object_id)
-            all_comments.extend(document_comments)
+    # 1. Get all comments for every document in the docket
+    all_comments, counts = get_comments_for_docket(docket_id)
+    
+    if not counts:
+        print("No documents found for this docket ID.")
+        return
     
     if not all_comments:
         print("No comments found for documents in this docket.")
         return
     
-    # 3. Save comments to CSV with attachment processing
+    # 2. Save comments to CSV with attachment processing
     csv_file = save_comments_to_csv(all_comments, docket_id, extract_attachments)
+    record_harvest(docket_id, all_comments, csv_file)
     print(f"\nComment data saved to {csv_file}")
     print("\nDone!")
 
@@ -0,0 +1,114 @@
+"""Opt-in on-disk cache for regulations.gov API responses
+
+Responses are stored in a SQLite file keyed by URL plus query parameters.
+Detail payloads (a single comment or document) rarely change once posted and
+are kept much longer than paged listings, which pick up new comments. The file
+is capped in size and the least recently used entries are evicted first. In
+offline mode only the cache is consulted and no API quota is spent.
+"""
+import hashlib
+import json
+import time
+import zlib
+from urllib.parse import urlencode, urlparse
+
+from sqlite_lru import SQLiteLRUCache
+
+DEFAULT_CACHE_PATH = "regulations_cache.sqlite"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Time to live in seconds for each endpoint type
+DEFAULT_TTLS = {
+    "detail": 30 * 24 * 3600,
+    "list": 6 * 3600,
+}
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response built from a cache entry"""
+
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, content):
+        self.content = content
+        self.headers = {}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def endpoint_type(url):
+    """Classify an API URL as a 'detail' (/comments/{id}) or 'list' request"""
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    # e.g. ['v4', 'comments'] is a listing, ['v4', 'comments', 'FSIS-...'] a detail
+    return "detail" if len(parts) >= 3 else "list"
+
+
+def cache_key(url, params=None):
+    query = urlencode(sorted((params or {}).items()))
+    return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache(SQLiteLRUCache):
+    """SQLite-backed response cache with per-endpoint TTLs and LRU eviction"""
+
+    table = "responses"
+    schema = ("CREATE TABLE IF NOT EXISTS responses ("
+              " key TEXT PRIMARY KEY, url TEXT, endpoint TEXT, body BLOB,"
+              " size INTEGER, created REAL, last_access REAL)",)
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, ttls=None, offline=False):
+        super().__init__(path, max_bytes)
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url, params=None):
+        """Return a CachedResponse for a fresh entry, or None"""
+        key = cache_key(url, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, endpoint, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            body, endpoint, created = row
+            # Expired entries are still served when offline; stale beats nothing
+            if not self.offline and now - created > self.ttls.get(endpoint, 0):
+                self.misses += 1
+                return None
+            self._touch([key])
+            self._conn.commit()
+            self.hits += 1
+        return CachedResponse(zlib.decompress(body))
+
+    def put(self, url, params, response):
+        """Store the body of a successful response"""
+        key = cache_key(url, params)
+        body = zlib.compress(response.content)
+        now = time.time()
+        with self._lock:
+            replaced = self._replaced([key])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, url, endpoint, body, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, endpoint_type(url), body, len(body), now, now),
+            )
+            self._grow(len(body) - replaced)
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": self._entries(),
+                "bytes": self._total_bytes,
+            }
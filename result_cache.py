@@ -0,0 +1,88 @@
+"""Persistent cache of classification results across dockets and re-runs
+
+The same boilerplate comments turn up in related dockets and in every re-run
+of a docket. Each classified comment's labels (Substantive, Confidence,
+Reason, ...) are stored under a key derived from the model version, the rule
+PDF's hash and the hash of the normalized comment text, so a text already
+scored against the same rule and model is never classified again. Replacing
+substantive_classifier_model.pkl changes the model version and therefore
+every key, which invalidates old entries; they age out of the size-capped
+SQLite file, least recently used first.
+"""
+import hashlib
+import json
+import time
+
+from metrics import RESULT_CACHE_LOOKUPS
+from sqlite_lru import LOOKUP_BATCH, SQLiteLRUCache
+from textnorm import normalize_text
+
+DEFAULT_CACHE_PATH = "classification_cache.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+
+def text_key(model_version, rule_hash, text):
+    """Cache key for one comment text classified against a rule with a model"""
+    text_hash = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{model_version}|{rule_hash}|{text_hash}".encode("utf-8")).hexdigest()
+
+
+class ClassificationCache(SQLiteLRUCache):
+    """SQLite store of per-comment labels keyed by text_key()"""
+
+    table = "results"
+    schema = ("CREATE TABLE IF NOT EXISTS results ("
+              " key TEXT PRIMARY KEY, body TEXT, size INTEGER, last_access REAL)",)
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path, max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup_many(self, keys):
+        """Return {key: labels dict} for the keys that are cached"""
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, body FROM results WHERE key IN ({placeholders})", batch).fetchall()
+                found.update((key, json.loads(body)) for key, body in rows)
+            self._touch(found)
+            self._conn.commit()
+            hits = len(found)
+            misses = len(keys) - hits
+            self.hits += hits
+            self.misses += misses
+        RESULT_CACHE_LOOKUPS.labels("hit").inc(hits)
+        RESULT_CACHE_LOOKUPS.labels("miss").inc(misses)
+        return found
+
+    def store_many(self, items):
+        """Store (key, labels dict) pairs"""
+        rows = []
+        for key, labels in items:
+            body = json.dumps(labels)
+            rows.append((key, body, len(body), time.time()))
+        if not rows:
+            return
+        with self._lock:
+            replaced = self._replaced(row[0] for row in rows)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (key, body, size, last_access) VALUES (?, ?, ?, ?)", rows)
+            self._grow(sum(row[2] for row in rows) - replaced)
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._entries()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
@@ -0,0 +1,134 @@
+"""SQLite index over classification results for the paginated comment viewer
+
+The viewer API filters, sorts and pages through results without loading them:
+a small per-session SQLite table holds each result row's position, ID,
+substantive flag, confidence and comment length, with indexes for the
+filters the viewer offers. A query returns the positions of one page of rows,
+which are then read from the memory-mapped results file. The index records
+the results' data version and is rebuilt when a new classification run
+replaces the results.
+"""
+import os
+import sqlite3
+import threading
+
+from results_store import iter_result_batches
+
+INDEX_FILE = "results_index.sqlite"
+# Viewer length filter values -> (min characters, max characters exclusive)
+LENGTH_BUCKETS = {
+    'less': (0, 1500),
+    'greater': (1500, None),
+}
+SORT_COLUMNS = {
+    'position': 'position',
+    'id': 'id_key',
+    'substantive': 'substantive',
+    'confidence': 'confidence',
+    'length': 'length',
+}
+MAX_PAGE_SIZE = 200
+
+_build_lock = threading.Lock()
+
+
+def _index_path(folder):
+    return os.path.join(folder, INDEX_FILE)
+
+
+def _index_version(path):
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+    except (sqlite3.Error, TypeError):
+        return None
+    finally:
+        conn.close()
+
+
+def build_index(folder, version):
+    """Scan the results a batch at a time and write a fresh index for `version`"""
+    path = _index_path(folder)
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute(
+        "CREATE TABLE rows (position INTEGER PRIMARY KEY, id TEXT, id_key TEXT,"
+        " substantive INTEGER, confidence REAL, length INTEGER)"
+    )
+    position = 0
+    for batch in iter_result_batches(folder, ['id', 'comment', 'Substantive', 'Confidence']):
+        ids = batch['id'].fillna('').astype(str) if 'id' in batch else [''] * len(batch)
+        lengths = batch['comment'].fillna('').astype(str).str.len() if 'comment' in batch else [0] * len(batch)
+        confidence = batch['Confidence'] if 'Confidence' in batch else [None] * len(batch)
+        rows = []
+        for comment_id, substantive, score, length in zip(ids, batch['Substantive'], confidence, lengths):
+            score = None if score is None or score != score else float(score)
+            rows.append((position, comment_id, comment_id.lower(), int(bool(substantive)), score, int(length)))
+            position += 1
+        conn.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("CREATE INDEX rows_id ON rows(id_key)")
+    conn.execute("CREATE INDEX rows_substantive_length ON rows(substantive, length)")
+    conn.execute("CREATE INDEX rows_confidence ON rows(confidence)")
+    conn.execute("CREATE INDEX rows_length ON rows(length)")
+    conn.execute("INSERT INTO meta VALUES ('version', ?)", (version,))
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+
+
+def ensure_index(folder, version):
+    """Build the index unless one for this data version already exists"""
+    path = _index_path(folder)
+    if _index_version(path) == version:
+        return path
+    with _build_lock:
+        if _index_version(path) != version:
+            build_index(folder, version)
+    return path
+
+
+def query_positions(folder, version, substantive=None, length=None, id_prefix=None,
+                    min_confidence=None, max_confidence=None, sort='position', descending=False,
+                    offset=0, limit=50):
+    """Return (matching row count, result positions of the requested page)"""
+    path = ensure_index(folder, version)
+    clauses, params = [], []
+    if substantive is not None:
+        clauses.append("substantive = ?")
+        params.append(int(substantive))
+    if length in LENGTH_BUCKETS:
+        low, high = LENGTH_BUCKETS[length]
+        clauses.append("length >= ?")
+        params.append(low)
+        if high is not None:
+            clauses.append("length < ?")
+            params.append(high)
+    if id_prefix:
+        # A range on the lower-cased ID uses the index, unlike LIKE
+        prefix = id_prefix.lower()
+        clauses.append("id_key >= ? AND id_key < ?")
+        params.extend([prefix, prefix + "\uffff"])
+    if min_confidence is not None:
+        clauses.append("confidence >= ?")
+        params.append(min_confidence)
+    if max_confidence is not None:
+        clauses.append("confidence <= ?")
+        params.append(max_confidence)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    order = f"{SORT_COLUMNS.get(sort, 'position')} {'DESC' if descending else 'ASC'}, position"
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM rows{where}", params).fetchone()[0]
+        positions = [row[0] for row in conn.execute(
+            f"SELECT position FROM rows{where} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [limit, max(0, int(offset))])]
+    finally:
+        conn.close()
+    return total, positions
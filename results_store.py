@@ -0,0 +1,289 @@
+"""Columnar store for classification results
+
+After classification the results are written once as an uncompressed Arrow
+(Feather) file with proper dtypes, which can be memory-mapped and read column
+by column, plus a small JSON summary with the counts, confidence and length
+statistics and example comments the results page needs. Page views read the
+summary (constant size) or map only the columns they use, instead of parsing
+classified_comments.csv every time.
+"""
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+ARROW_SUPPORT = False
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    ARROW_SUPPORT = True
+except ImportError:
+    pass
+
+RESULTS_FILE = "classified_comments.feather"
+RESULTS_CSV = "classified_comments.csv"
+RESULTS_TSV = "classified_comments.tsv"
+SUMMARY_FILE = "classified_summary.json"
+EXAMPLES_PER_CLASS = 5
+# Enough of each example for results.html to show 500 characters and an ellipsis
+EXAMPLE_CHARS = 501
+
+
+def coerce_result_dtypes(df):
+    """Give classifier output its real dtypes (bool Substantive, numeric scores)"""
+    df = df.reset_index(drop=True)
+    if 'Substantive' in df.columns and df['Substantive'].dtype != bool:
+        df['Substantive'] = df['Substantive'].map(
+            lambda value: str(value).strip().lower() in ('true', '1', '1.0')
+        ).astype(bool)
+    for column in ('Confidence', 'Comment_Length'):
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    for column in ('id', 'comment', 'Reason'):
+        if column in df.columns:
+            df[column] = df[column].fillna('').astype(str)
+    return df
+
+
+def _stats(series):
+    series = series.dropna()
+    if series.empty:
+        return None
+    return {
+        'count': int(series.count()),
+        'mean': float(series.mean()),
+        'min': float(series.min()),
+        'p25': float(series.quantile(0.25)),
+        'median': float(series.median()),
+        'p75': float(series.quantile(0.75)),
+        'max': float(series.max()),
+    }
+
+
+def _examples(df):
+    columns = [column for column in ('id', 'comment', 'Confidence', 'Reason') if column in df.columns]
+    examples = []
+    for record in df[columns].head(EXAMPLES_PER_CLASS).to_dict('records'):
+        if 'comment' in record:
+            record['comment'] = record['comment'][:EXAMPLE_CHARS]
+        if 'Confidence' in record and isinstance(record['Confidence'], float) and math.isnan(record['Confidence']):
+            del record['Confidence']
+        examples.append(record)
+    return examples
+
+
+STAT_COLUMNS = (('Confidence', 'confidence'), ('Comment_Length', 'length'))
+
+
+def build_summary(df):
+    """Aggregate counts, statistics and examples from coerced results"""
+    substantive = df[df['Substantive']]
+    nonsubstantive = df[~df['Substantive']]
+    summary = {
+        'total': int(len(df)),
+        'substantive': int(len(substantive)),
+        'nonsubstantive': int(len(nonsubstantive)),
+        'columns': list(df.columns),
+        'version': f"{len(df)}-{time.time_ns()}",
+        'examples': {
+            'substantive': _examples(substantive),
+            'nonsubstantive': _examples(nonsubstantive),
+        },
+    }
+    for column, key in STAT_COLUMNS:
+        if column in df.columns:
+            summary[key] = {
+                'substantive': _stats(substantive[column]),
+                'nonsubstantive': _stats(nonsubstantive[column]),
+            }
+    return summary
+
+
+def _write_summary(summary, folder):
+    tmp_path = os.path.join(folder, SUMMARY_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+    os.replace(tmp_path, os.path.join(folder, SUMMARY_FILE))
+
+
+def write_results(df, folder):
+    """Write the columnar results file and summary sidecar; returns the summary"""
+    df = coerce_result_dtypes(df)
+    if ARROW_SUPPORT:
+        tmp_path = os.path.join(folder, RESULTS_FILE + '.tmp')
+        # Uncompressed so readers can memory-map it without decoding
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, os.path.join(folder, RESULTS_FILE))
+    summary = build_summary(df)
+    _write_summary(summary, folder)
+    return summary
+
+
+class ResultsWriter:
+    """Write results chunk by chunk without holding the whole docket in memory
+
+    Each chunk is appended to classified_comments.csv (and .tsv), written as a
+    record batch of the Arrow file, and folded into the running summary; only
+    the numeric statistic columns are kept until close(). Files are written
+    under temporary names and replace the folder's previous results only on
+    close(); abort() discards them.
+    """
+
+    def __init__(self, folder, tsv=True):
+        self.folder = folder
+        self.columns = None
+        self.total = 0
+        self.substantive = 0
+        self._examples = {'substantive': [], 'nonsubstantive': []}
+        self._stat_values = {}
+        self._csv = open(self._tmp_path(RESULTS_CSV), 'w', newline='', encoding='utf-8')
+        self._tsv = None
+        if tsv:
+            self._tsv = open(self._tmp_path(RESULTS_TSV), 'w', newline='', encoding='utf-8')
+        self._arrow = None
+        self._schema = None
+
+    def _tmp_path(self, name):
+        return os.path.join(self.folder, name + '.tmp')
+
+    def _conform(self, df):
+        """Give every chunk the first chunk's columns and stable dtypes"""
+        df = coerce_result_dtypes(df)
+        if self.columns is None:
+            self.columns = list(df.columns)
+        df = df.reindex(columns=self.columns)
+        for column in self.columns:
+            if column == 'Substantive':
+                df[column] = df[column].fillna(False).astype(bool)
+            elif column in ('Confidence', 'Comment_Length'):
+                # Integer in one chunk, float (with gaps) in the next
+                df[column] = df[column].astype(float)
+            elif column == 'cluster_size':
+                df[column] = df[column].astype('int64')
+            else:
+                # Free-text columns may look numeric or empty in one chunk and not the next
+                df[column] = df[column].fillna('').astype(str)
+        return df
+
+    def write(self, df):
+        """Append one chunk of classifier results"""
+        if df.empty:
+            return
+        header = self.columns is None
+        df = self._conform(df)
+        df.to_csv(self._csv, index=False, header=header)
+        if self._tsv is not None:
+            df.to_csv(self._tsv, sep='\t', index=False, header=header)
+
+        if ARROW_SUPPORT:
+            if self._arrow is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._schema = table.schema
+                self._arrow = pa.ipc.new_file(self._tmp_path(RESULTS_FILE), self._schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            self._arrow.write_table(table)
+
+        mask = df['Substantive']
+        self.total += len(df)
+        self.substantive += int(mask.sum())
+        for key, part in (('substantive', df[mask]), ('nonsubstantive', df[~mask])):
+            if len(self._examples[key]) < EXAMPLES_PER_CLASS:
+                self._examples[key].extend(_examples(part)[:EXAMPLES_PER_CLASS - len(self._examples[key])])
+            for column, stat_key in STAT_COLUMNS:
+                if column in part.columns:
+                    self._stat_values.setdefault((stat_key, key), []).append(part[column].to_numpy())
+
+    def _close_files(self):
+        self._csv.close()
+        if self._tsv is not None:
+            self._tsv.close()
+        if self._arrow is not None:
+            self._arrow.close()
+
+    def close(self, extra=None):
+        """Finish the files and write the summary (plus any `extra` keys); returns the summary"""
+        self._close_files()
+        os.replace(self._tmp_path(RESULTS_CSV), os.path.join(self.folder, RESULTS_CSV))
+        if self._tsv is not None:
+            os.replace(self._tmp_path(RESULTS_TSV), os.path.join(self.folder, RESULTS_TSV))
+        if self._arrow is not None:
+            os.replace(self._tmp_path(RESULTS_FILE), os.path.join(self.folder, RESULTS_FILE))
+        elif os.path.exists(os.path.join(self.folder, RESULTS_FILE)):
+            # No rows: don't leave an earlier run's Arrow file beside the new CSV
+            os.remove(os.path.join(self.folder, RESULTS_FILE))
+
+        summary = {
+            'total': self.total,
+            'substantive': self.substantive,
+            'nonsubstantive': self.total - self.substantive,
+            'columns': self.columns or [],
+            'version': f"{self.total}-{time.time_ns()}",
+            'examples': self._examples,
+        }
+        for column, stat_key in STAT_COLUMNS:
+            if self.columns and column in self.columns:
+                summary[stat_key] = {
+                    key: _stats(pd.Series(np.concatenate(self._stat_values.get((stat_key, key), [np.array([])]))))
+                    for key in ('substantive', 'nonsubstantive')
+                }
+        summary.update(extra or {})
+        _write_summary(summary, self.folder)
+        return summary
+
+    def abort(self):
+        """Discard the files written so far, leaving the folder's previous results in place"""
+        self._close_files()
+        for name in (RESULTS_CSV, RESULTS_TSV, RESULTS_FILE):
+            if os.path.exists(self._tmp_path(name)):
+                os.remove(self._tmp_path(name))
+
+
+def load_summary(folder):
+    """Return the summary written with the results, or None"""
+    path = os.path.join(folder, SUMMARY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_results(folder, columns=None):
+    """Load results, memory-mapping the Arrow file and reading only `columns`
+
+    Falls back to parsing classified_comments.csv when there is no Arrow file.
+    """
+    path = os.path.join(folder, RESULTS_FILE)
+    if ARROW_SUPPORT and os.path.exists(path):
+        if columns is not None:
+            available = pa.ipc.open_file(pa.memory_map(path)).schema.names
+            columns = [column for column in columns if column in available]
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        return table.to_pandas()
+    df = pd.read_csv(os.path.join(folder, RESULTS_CSV), usecols=lambda c: columns is None or c in columns)
+    return coerce_result_dtypes(df)
+
+
+def iter_result_batches(folder, columns):
+    """Yield DataFrames of `columns` a record batch at a time, for scans of large results"""
+    path = os.path.join(folder, RESULTS_FILE)
+    if ARROW_SUPPORT and os.path.exists(path):
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        columns = [column for column in columns if column in reader.schema.names]
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i).select(columns).to_pandas()
+        return
+    yield load_results(folder, columns)
+
+
+def read_rows(folder, positions, columns=None):
+    """Return the result rows at `positions` (in that order) as a list of dicts"""
+    path = os.path.join(folder, RESULTS_FILE)
+    if ARROW_SUPPORT and os.path.exists(path):
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        return table.take(pa.array(positions, type=pa.int64())).to_pylist()
+    df = load_results(folder, columns).iloc[positions]
+    return df.astype(object).where(df.notna(), None).to_dict('records')
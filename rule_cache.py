@@ -0,0 +1,94 @@
+"""Cache of rule-PDF features keyed by file contents
+
+Classifying against a rule starts with classifier.read_pdf(), which parses a
+(usually large) Federal Register PDF and vectorizes its text. The same rule is
+uploaded again and again across sessions, so the result is stored once per
+SHA-256 of the PDF and model version in a size-capped SQLite file, least
+recently used entries evicted first. Concurrent uploads of the same rule in
+one process wait for a single extraction instead of each parsing the file.
+"""
+import pickle
+import threading
+import time
+import zlib
+
+from attachment_cache import file_sha256
+from metrics import RULE_CACHE_LOOKUPS
+from sqlite_lru import SQLiteLRUCache
+
+DEFAULT_CACHE_PATH = "rule_feature_cache.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+class RuleFeatureCache(SQLiteLRUCache):
+    """SQLite store of pickled rule features keyed by PDF hash and model version"""
+
+    table = "features"
+    schema = ("CREATE TABLE IF NOT EXISTS features ("
+              " key TEXT PRIMARY KEY, body BLOB, size INTEGER, last_access REAL)",)
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        # One lock per key being computed, so identical uploads parse once
+        self._inflight = {}
+
+    def _get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM features WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._touch([key])
+            self._conn.commit()
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def _put(self, key, features):
+        try:
+            body = zlib.compress(pickle.dumps(features, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            print(f"Rule features could not be cached: {str(e)}")
+            return
+        with self._lock:
+            replaced = self._replaced([key])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO features (key, body, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, body, len(body), time.time()),
+            )
+            self._grow(len(body) - replaced)
+            self._conn.commit()
+
+    def get_or_compute(self, pdf_path, compute, version=None):
+        """Return cached features for the PDF's contents, or compute(pdf_path) and store them"""
+        key = f"{file_sha256(pdf_path)}:{version}"
+        features = self._get(key)
+        if features is not None:
+            self.hits += 1
+            RULE_CACHE_LOOKUPS.labels("hit").inc()
+            return features
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                # Another request may have finished this rule while we waited
+                features = self._get(key)
+                if features is not None:
+                    self.hits += 1
+                    RULE_CACHE_LOOKUPS.labels("hit").inc()
+                    return features
+                self.misses += 1
+                RULE_CACHE_LOOKUPS.labels("miss").inc()
+                features = compute(pdf_path)
+                if features is not None:
+                    self._put(key, features)
+                return features
+            finally:
+                with self._lock:
+                    if self._inflight.get(key) is key_lock:
+                        del self._inflight[key]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": self._entries(),
+                    "bytes": self._total_bytes}
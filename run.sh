@@ -29,7 +29,7 @@ fi
 
 # Install or upgrade required packages
 echo "Installing required packages..."
-pip install --upgrade flask pandas matplotlib scikit-learn PyPDF2 requests
+pip install --upgrade flask pandas pyarrow matplotlib scikit-learn PyPDF2 requests
 if [ $? -ne 0 ]; then
     echo "Warning: Some packages may not have installed correctly."
 fi
@@ -38,7 +38,7 @@ fi
 mkdir -p templates static uploads outputs
 
 # Check if required Python scripts exist
-for script in "app.py" "commentbuilder.py" "cc2.py"; do
+for script in "NewApp.py" "newcommentbuilder.py" "cc2.py"; do
     if [ ! -f "$script" ]; then
         echo "Error: Required script $script not found."
         exit 1
@@ -46,7 +46,7 @@ for script in "app.py" "commentbuilder.py" "cc2.py"; do
 done
 
 # Check if template files exist
-for template in "templates/base.html" "templates/index.html" "templates/upload_pdf.html" "templates/results.html"; do
+for template in "templates/base.html" "templates/index.html" "templates/upload_pdf.html" "templates/results.html" "templates/comment_viewer.html" "templates/job_status.html"; do
     if [ ! -f "$template" ]; then
         echo "Error: Required template $template not found."
         exit 1
@@ -61,4 +61,4 @@ echo "The application will be accessible at: http://$IP_ADDRESS:5000"
 echo "Press Ctrl+C to stop the server."
 
 # Start the Flask application
-python3 app.py
\ No newline at end of file
+python3 NewApp.py
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""Full-text search over harvested comments
+
+Rows are added to a SQLite FTS5 index as the harvester writes them, so a
+docket is searchable as soon as its harvest finishes. Comment text includes
+extracted attachment text. Queries use FTS5 syntax: words (all must match),
+"quoted phrases", OR, NOT, NEAR(...) and prefix* terms. Results are ranked
+by BM25, with title matches weighted above body matches, and each comes with
+a snippet around the matched terms. The comment table is the index's
+external content, so text is stored once; the file is shared across dockets
+and a re-harvested comment replaces its earlier row.
+"""
+import csv
+import html
+import sqlite3
+import sys
+import threading
+
+DEFAULT_INDEX_PATH = "comment_search.sqlite"
+# Rows added per transaction while a harvest is writing
+COMMIT_ROWS = 200
+SNIPPET_TOKENS = 32
+# BM25 weights of the title and body columns
+TITLE_WEIGHT = 2.0
+BODY_WEIGHT = 1.0
+MAX_RESULTS = 100
+
+# Private-use characters mark matches in snippets until the text is HTML-escaped
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS comments ("
+    " rowid INTEGER PRIMARY KEY, docket_id TEXT, comment_id TEXT, title TEXT, body TEXT,"
+    " posted_date TEXT, UNIQUE (docket_id, comment_id))",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5("
+    " title, body, content='comments', content_rowid='rowid', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS comments_ai AFTER INSERT ON comments BEGIN"
+    " INSERT INTO comments_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS comments_ad AFTER DELETE ON comments BEGIN"
+    " INSERT INTO comments_fts (comments_fts, rowid, title, body)"
+    " VALUES ('delete', old.rowid, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS comments_au AFTER UPDATE ON comments BEGIN"
+    " INSERT INTO comments_fts (comments_fts, rowid, title, body)"
+    " VALUES ('delete', old.rowid, old.title, old.body);"
+    " INSERT INTO comments_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body); END",
+]
+
+# Unchanged rows (e.g. re-indexing a resumed harvest) skip the FTS update
+_UPSERT = (
+    "INSERT INTO comments (docket_id, comment_id, title, body, posted_date) VALUES (?, ?, ?, ?, ?)"
+    " ON CONFLICT (docket_id, comment_id) DO UPDATE SET"
+    " title = excluded.title, body = excluded.body, posted_date = excluded.posted_date"
+    " WHERE title IS NOT excluded.title OR body IS NOT excluded.body"
+)
+
+
+def _row_values(docket_id, row):
+    return (docket_id, row.get("id", ""), row.get("title") or "", row.get("comment") or "",
+            row.get("postedDate") or "")
+
+
+def _literal_query(query):
+    """Quote every word so FTS5 operators and punctuation are matched as plain text"""
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+
+
+def _highlight(snippet):
+    """HTML-escape a snippet and turn its match markers into <mark> tags"""
+    return html.escape(snippet).replace(_MATCH_START, "<mark>").replace(_MATCH_END, "</mark>")
+
+
+class CommentSearchIndex:
+    """SQLite FTS5 index of comment rows keyed by (docket ID, comment ID)"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.execute("INSERT INTO comments_fts (comments_fts, rank) VALUES ('rank', ?)",
+                           (f"bm25({TITLE_WEIGHT}, {BODY_WEIGHT})",))
+        self._conn.commit()
+
+    def add(self, docket_id, row):
+        """Index (or replace) one CSV row; committed in batches, see flush()"""
+        with self._lock:
+            self._conn.execute(_UPSERT, _row_values(docket_id, row))
+            self._pending += 1
+            if self._pending >= COMMIT_ROWS:
+                self._conn.commit()
+                self._pending = 0
+
+    def add_many(self, docket_id, rows):
+        with self._lock:
+            self._conn.executemany(_UPSERT, (_row_values(docket_id, row) for row in rows))
+            self._conn.commit()
+            self._pending = 0
+
+    def add_csv(self, docket_id, csv_path, skip_ids=()):
+        """Index the rows of a comment CSV, except those whose ID is in skip_ids"""
+        csv.field_size_limit(sys.maxsize)
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            self.add_many(docket_id, (row for row in csv.DictReader(f) if row.get("id") not in skip_ids))
+
+    def clear(self, docket_id):
+        """Remove every row indexed under docket_id"""
+        with self._lock:
+            self._conn.execute("DELETE FROM comments WHERE docket_id = ?", (docket_id,))
+            self._conn.commit()
+            self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def indexed_ids(self, docket_id):
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                "SELECT comment_id FROM comments WHERE docket_id = ?", (docket_id,))}
+
+    def search(self, docket_id, query, limit=20, offset=0):
+        """Return (matching comment count, ranked results) for an FTS5 query within a docket
+
+        Each result has the comment's id, title, postedDate, score and an
+        HTML snippet with matches wrapped in <mark>. A query that isn't valid
+        FTS5 syntax is retried with its words matched literally.
+        """
+        limit = max(1, min(int(limit), MAX_RESULTS))
+        try:
+            return self._search(docket_id, query, limit, max(0, int(offset)))
+        except sqlite3.OperationalError:
+            literal = _literal_query(query)
+            if not literal or literal == query:
+                raise
+            return self._search(docket_id, literal, limit, max(0, int(offset)))
+
+    def _search(self, docket_id, query, limit, offset):
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM comments_fts CROSS JOIN comments ON comments.rowid = comments_fts.rowid"
+                " WHERE comments_fts MATCH ? AND comments.docket_id = ?", (query, docket_id)).fetchone()[0]
+            # Rank first, then build snippets only for the page being returned
+            ranked = self._conn.execute(
+                "SELECT comments_fts.rowid, rank FROM comments_fts"
+                " CROSS JOIN comments ON comments.rowid = comments_fts.rowid"
+                " WHERE comments_fts MATCH ? AND comments.docket_id = ?"
+                " ORDER BY rank LIMIT ? OFFSET ?", (query, docket_id, limit, offset)).fetchall()
+            if not ranked:
+                return total, []
+            placeholders = ",".join("?" * len(ranked))
+            rows = self._conn.execute(
+                "SELECT comments_fts.rowid, comments.comment_id, comments.title, comments.posted_date,"
+                " snippet(comments_fts, -1, ?, ?, '...', ?) FROM comments_fts"
+                " CROSS JOIN comments ON comments.rowid = comments_fts.rowid"
+                f" WHERE comments_fts MATCH ? AND comments_fts.rowid IN ({placeholders})",
+                [_MATCH_START, _MATCH_END, SNIPPET_TOKENS, query] + [rowid for rowid, _ in ranked]).fetchall()
+        by_rowid = {row[0]: row[1:] for row in rows}
+        results = []
+        for rowid, rank in ranked:
+            comment_id, title, posted_date, snippet = by_rowid[rowid]
+            results.append({
+                "id": comment_id,
+                "title": title,
+                "postedDate": posted_date,
+                # bm25() is lower for better matches; flip it so higher is better
+                "score": round(-rank, 4),
+                "snippet": _highlight(snippet),
+            })
+        return total, results
+
+    def stats(self):
+        with self._lock:
+            comments, dockets = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT docket_id) FROM comments").fetchone()
+            return {"comments": comments, "dockets": dockets}
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
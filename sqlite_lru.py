@@ -0,0 +1,90 @@
+"""Size-capped SQLite store with least-recently-used eviction
+
+Shared base of the on-disk caches (API responses, attachment text, rule
+features, classification results). Each subclass names a table with a key
+column, a size column and a last_access column; the base owns the
+connection, keeps a running total of stored bytes and, once a write takes
+the total over max_bytes, deletes the least recently used rows until it is
+back under the trim target.
+"""
+import sqlite3
+import threading
+import time
+
+# Eviction trims to this fraction of the cap so every write near the limit doesn't evict
+EVICT_TO = 0.9
+# SQLite's default limit on host parameters in one statement is 999
+LOOKUP_BATCH = 500
+
+
+class SQLiteLRUCache:
+    """Connection, byte accounting and LRU eviction for one cache table
+
+    Subclasses set table, key_column and schema (the CREATE statements for
+    their tables), and call _replaced() and _grow() under self._lock when they
+    write rows, committing afterwards.
+    """
+
+    table = None
+    key_column = "key"
+    schema = ()
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in self.schema:
+            self._conn.execute(statement)
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_lru ON {self.table}(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def _touch(self, keys):
+        """Mark rows as just used"""
+        now = time.time()
+        self._conn.executemany(f"UPDATE {self.table} SET last_access = ? WHERE {self.key_column} = ?",
+                               [(now, key) for key in keys])
+
+    def _replaced(self, keys):
+        """Total size of the stored rows among keys, i.e. the bytes a write of them replaces"""
+        keys = list(keys)
+        total = 0
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[start:start + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            total += self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {self.table} WHERE {self.key_column} IN ({placeholders})",
+                batch).fetchone()[0]
+        return total
+
+    def _grow(self, added_bytes):
+        """Account for a write and evict if it took the store over its cap"""
+        self._total_bytes += added_bytes
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used rows down to EVICT_TO of the cap; returns the deleted keys"""
+        target = self.max_bytes * EVICT_TO
+        # Walk the LRU index only as far as needed rather than loading every row
+        cursor = self._conn.execute(f"SELECT {self.key_column}, size FROM {self.table} ORDER BY last_access")
+        doomed = []
+        try:
+            for key, size in cursor:
+                if self._total_bytes <= target:
+                    break
+                doomed.append((key,))
+                self._total_bytes -= size
+        finally:
+            cursor.close()
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", doomed)
+        return doomed
+
+    def _entries(self):
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("matplotlib")
+
+import charts
+from results_store import write_results
+
+
+def _results(folder):
+    return write_results(pd.DataFrame({
+        'id': ['a', 'b', 'c', 'd'],
+        'comment': ['w', 'xx', 'yyy', 'zzzz'],
+        'Substantive': [True, False, True, False],
+        'Comment_Length': [1, 2, 3, 4],
+    }), folder)
+
+
+def test_every_applicable_chart_renders(tmp_path):
+    summary = _results(str(tmp_path))
+    for name in ('classification_pie.png', 'length_comparison.png'):
+        path = charts.get_chart(str(tmp_path), name, summary['version'])
+        with open(path, 'rb') as f:
+            assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+
+
+def test_inapplicable_chart_is_remembered(tmp_path, monkeypatch):
+    summary = _results(str(tmp_path))
+    assert charts.get_chart(str(tmp_path), 'confidence_histogram.png', summary['version']) is None
+    assert not charts._render_locks
+
+    def fail(*args, **kwargs):
+        raise AssertionError("results reloaded")
+    monkeypatch.setattr(charts, 'load_results', fail)
+    assert charts.get_chart(str(tmp_path), 'confidence_histogram.png', summary['version']) is None
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith('.tmp')]
@@ -0,0 +1,76 @@
+import csv
+
+import pytest
+
+from checkpoint import HarvestJournal, HarvestInProgress, has_checkpoint
+
+
+def test_live_journal_cannot_be_replaced_or_resumed(tmp_path):
+    state_dir = str(tmp_path)
+    journal = HarvestJournal.create("D-1", [{"id": "a"}], "out.csv", state_dir=state_dir)
+    journal.record("a", 10)
+
+    with pytest.raises(HarvestInProgress):
+        HarvestJournal.create("D-1", [], "other.csv", state_dir=state_dir)
+    with pytest.raises(HarvestInProgress):
+        HarvestJournal.open("D-1", state_dir=state_dir)
+    # The live journal was left alone
+    assert journal.progress() == ({"a"}, 10)
+    journal.close()
+
+
+def test_interrupted_journal_resumes_and_finishes(tmp_path):
+    state_dir = str(tmp_path)
+    HarvestJournal.create("D-1", [{"id": "a"}, {"id": "b"}], "out.csv", state_dir=state_dir).close()
+
+    journal = HarvestJournal.open("D-1", state_dir=state_dir)
+    assert journal.output_file == "out.csv"
+    assert [comment["id"] for comment in journal.listed()] == ["a", "b"]
+    journal.finish()
+    journal.close()
+    assert not has_checkpoint("D-1", state_dir=state_dir)
+    assert HarvestJournal.open("D-1", state_dir=state_dir) is None
+
+
+@pytest.mark.parametrize("docket_id", ["../../x", "a/b", "..", "", "D 1"])
+def test_path_like_docket_ids_are_rejected(tmp_path, docket_id):
+    victim = tmp_path / "x"
+    victim.mkdir()
+    with pytest.raises(ValueError):
+        HarvestJournal.create(docket_id, [], "out.csv", state_dir=str(tmp_path / "a" / "b"))
+    with pytest.raises(ValueError):
+        has_checkpoint(docket_id, state_dir=str(tmp_path))
+    assert victim.exists()
+
+
+def _rows(fetched, fail_after=None):
+    def iter_comment_rows(comments, extract_attachments=True, concurrency=1):
+        for number, comment in enumerate(comments):
+            if number == fail_after:
+                raise KeyboardInterrupt
+            fetched.append(comment["id"])
+            yield {"id": comment["id"], "title": "", "comment": f"text of {comment['id']}"}
+    return iter_comment_rows
+
+
+def test_resume_harvest_fetches_only_unsaved_comments(tmp_path, monkeypatch):
+    newcommentbuilder = pytest.importorskip("newcommentbuilder")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(newcommentbuilder, "USE_SEARCH_INDEX", False)
+    listed = [{"id": comment_id} for comment_id in ("a", "b", "c")]
+    fetched = []
+
+    monkeypatch.setattr(newcommentbuilder, "iter_comment_rows", _rows(fetched, fail_after=2))
+    with pytest.raises(KeyboardInterrupt):
+        newcommentbuilder.save_comments_to_csv(listed, "D-1")
+    assert has_checkpoint("D-1")
+
+    monkeypatch.setattr(newcommentbuilder, "iter_comment_rows", _rows(fetched))
+    filename, comments = newcommentbuilder.resume_harvest("D-1")
+
+    assert fetched == ["a", "b", "c"]
+    assert comments == listed
+    with open(filename, newline="", encoding="utf-8") as f:
+        assert [row["id"] for row in csv.DictReader(f)] == ["a", "b", "c"]
+    assert not has_checkpoint("D-1")
+    assert newcommentbuilder.resume_harvest("D-1") is None
@@ -0,0 +1,117 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("numpy")
+
+from classification import classify, classify_docket, CHUNK_ROWS
+from results_store import load_results
+
+
+class FakeClassifier:
+    """Labels comments mentioning "acid" as substantive, like cc2's classifier API"""
+
+    def __init__(self):
+        self.comments = None
+        self.results = None
+
+    def load_comments_csv(self, source):
+        self.comments = pd.read_csv(source, dtype=str, keep_default_na=False)
+        return self.comments['comment']
+
+    def classify_comments(self, rule_features):
+        df = self.comments.copy()
+        df['Substantive'] = df['comment'].str.contains('acid')
+        df['Confidence'] = 0.9
+        df['Reason'] = 'test'
+        df['Comment_Length'] = df['comment'].str.len()
+        self.results = df
+        return True
+
+    def save_results(self):
+        raise AssertionError("results should be read from memory")
+
+
+def _write_comments(path, rows):
+    pd.DataFrame(rows, columns=['id', 'comment']).to_csv(path, index=False)
+
+
+def test_classify_docket_over_several_chunks(tmp_path):
+    letter = "We urge the agency to limit benzoic acid in poultry products because of its health effects"
+    rows = [(f"C{i}", f"Unique comment number {i} about plant {i * 7} inspection staffing levels")
+            for i in range(CHUNK_ROWS + 500)]
+    rows[0] = ("C0", letter)
+    # Form letter copies with a different length than the representative
+    rows[3] = ("C3", letter + " !")
+    rows[CHUNK_ROWS + 99] = (f"C{CHUNK_ROWS + 99}", letter + " ok!!")
+    csv_path = tmp_path / "comments.csv"
+    _write_comments(csv_path, rows)
+
+    summary = classify_docket(str(csv_path), None, str(tmp_path), classifier=FakeClassifier())
+
+    results = load_results(str(tmp_path))
+    assert summary['total'] == len(rows) == len(results)
+    assert list(results['id']) == [row[0] for row in rows]
+    copies = results[results['cluster_id'] == 'C0']
+    assert len(copies) == 3
+    assert copies['Substantive'].all()
+    assert list(copies['Comment_Length']) == [len(letter), len(letter) + 2, len(letter) + 5]
+
+
+class CwdOnlyClassifier(FakeClassifier):
+    """A classifier that can only hand back results through classified_comments.csv in cwd"""
+
+    def load_model(self):
+        return True
+
+    def classify_comments(self, rule_features):
+        super().classify_comments(rule_features)
+        # Keep the results where results_frame() can't find them
+        self.rows, self.results = self.results.to_dict('records'), None
+        return True
+
+    def save_results(self):
+        pd.DataFrame(self.rows).to_csv("classified_comments.csv", index=False)
+
+
+def test_streaming_workers_use_private_cwd(tmp_path):
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(b"")
+    rows = [(f"C{i}", f"Comment {i} {'acid' if i % 3 == 0 else 'salt'}") for i in range(300)]
+    csv_path = tmp_path / "comments.csv"
+    _write_comments(csv_path, rows)
+    folder = tmp_path / "out"
+    folder.mkdir()
+
+    classify_docket(str(csv_path), None, str(folder), factory=CwdOnlyClassifier, model_path=str(model_path),
+                    streaming=True, deduplicate=False, chunk_rows=25, workers=2)
+
+    results = load_results(str(folder))
+    assert list(results['id']) == [row[0] for row in rows]
+    assert list(results['Substantive']) == [i % 3 == 0 for i in range(300)]
+
+
+class PathResultsClassifier(FakeClassifier):
+    """Keeps results private but can save them to a given path"""
+
+    def classify_comments(self, rule_features):
+        super().classify_comments(rule_features)
+        self.rows, self.results = self.results.to_dict('records'), None
+        return True
+
+    def save_results(self, path):
+        pd.DataFrame(self.rows).to_csv(path, index=False)
+
+
+@pytest.mark.parametrize("classifier_class", [FakeClassifier, PathResultsClassifier])
+def test_classify_hands_off_in_memory_without_cwd_files(tmp_path, monkeypatch, classifier_class):
+    monkeypatch.chdir(tmp_path)
+    frame = pd.DataFrame([("a", "acid levels"), ("b", "salt")], columns=['id', 'comment'])
+    csv_path = tmp_path / "comments.csv"
+    frame.to_csv(csv_path, index=False)
+
+    with open(csv_path, newline='', encoding='utf-8') as handle:
+        for source in (frame, handle, str(csv_path)):
+            results = classify(classifier_class(), source, None)
+            assert list(results['Substantive']) == [True, False]
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["comments.csv"]
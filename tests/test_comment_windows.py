@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+import newcommentbuilder
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 2, 1)
+
+
+def test_window_count_is_retried(monkeypatch):
+    answers = iter([None, 42])
+    monkeypatch.setattr(newcommentbuilder, "count_comments_in_window", lambda *args: next(answers))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert newcommentbuilder.plan_comment_windows("obj", START, END, executor) == [(START, END, 42)]
+
+
+def test_uncountable_window_fails_the_listing(monkeypatch):
+    monkeypatch.setattr(newcommentbuilder, "count_comments_in_window", lambda *args: None)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(RuntimeError):
+            newcommentbuilder.plan_comment_windows("obj", START, END, executor)
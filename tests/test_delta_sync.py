@@ -0,0 +1,90 @@
+import csv
+
+import pytest
+
+import delta_sync
+
+FIELDS = ["id", "comment"]
+
+
+def _comment(comment_id, modified):
+    return {"id": comment_id, "attributes": {"lastModifiedDate": modified}}
+
+
+def test_merge_keeps_rows_with_long_attachment_text(tmp_path):
+    path = str(tmp_path / "comments.csv")
+    long_text = "attachment text " * 10000
+    assert len(long_text) > 128 * 1024
+    delta_sync.merge_rows_into_csv(path, [{"id": "a", "comment": long_text}], FIELDS)
+
+    added, updated = delta_sync.merge_rows_into_csv(
+        path, [{"id": "b", "comment": "new"}, {"id": "a", "comment": "edited"}], FIELDS)
+
+    assert (added, updated) == (1, 1)
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["id"], row["comment"]) for row in rows] == [("a", "edited"), ("b", "new")]
+
+
+def test_high_water_mark_skips_seen_boundary_comments():
+    listed = [_comment("a", "2024-01-01T10:00:00Z"), _comment("b", "2024-01-02T10:00:00Z"),
+              _comment("c", "2024-01-02T10:00:00Z")]
+    state = delta_sync.advance_state(None, "D-1", listed, "out.csv")
+    assert state["high_water"] == "2024-01-02T10:00:00Z"
+    assert state["boundary_ids"] == ["b", "c"]
+
+    relisted = listed[1:] + [_comment("d", "2024-01-02T10:00:00Z"), _comment("e", "2024-01-03T09:00:00Z")]
+    assert [c["id"] for c in delta_sync.filter_new_comments(relisted, state)] == ["d", "e"]
+
+
+def test_state_round_trips(tmp_path):
+    state = {"high_water": "2024-01-02T10:00:00Z", "boundary_ids": ["b"]}
+    delta_sync.save_state("D-1", state, state_dir=str(tmp_path))
+    assert delta_sync.load_state("D-1", state_dir=str(tmp_path)) == state
+    assert delta_sync.load_state("D-2", state_dir=str(tmp_path)) is None
+
+
+def test_sync_docket_merges_only_new_and_changed_comments(tmp_path, monkeypatch):
+    newcommentbuilder = pytest.importorskip("newcommentbuilder")
+    monkeypatch.chdir(tmp_path)
+    for flag in ("USE_SEARCH_INDEX", "USE_ATTACHMENT_POOL", "USE_ATTACHMENT_CACHE"):
+        monkeypatch.setattr(newcommentbuilder, flag, False)
+    listings = iter([
+        [_comment("a", "2024-01-01T10:00:00Z"), _comment("b", "2024-01-02T10:00:00Z")],
+        [_comment("b", "2024-01-02T10:00:00Z"), _comment("a", "2024-01-03T10:00:00Z"),
+         _comment("c", "2024-01-03T11:00:00Z")],
+    ])
+    since = []
+    fetched = []
+
+    def get_comments_for_docket(docket_id, modified_since=None):
+        since.append(modified_since)
+        return next(listings), {}
+
+    def iter_comment_rows(comments, extract_attachments=True, concurrency=1):
+        for comment in comments:
+            fetched.append(comment["id"])
+            yield {"id": comment["id"], "comment": comment["attributes"]["lastModifiedDate"]}
+
+    monkeypatch.setattr(newcommentbuilder, "get_comments_for_docket", get_comments_for_docket)
+    monkeypatch.setattr(newcommentbuilder, "iter_comment_rows", iter_comment_rows)
+
+    output_file, count = newcommentbuilder.sync_docket("D-1")
+    assert count == 2
+    output_file, count = newcommentbuilder.sync_docket("D-1")
+    assert count == 2
+
+    assert since[0] is None and since[1]
+    assert fetched == ["a", "b", "a", "c"]
+    with open(output_file, newline="", encoding="utf-8") as f:
+        rows = [(row["id"], row["comment"]) for row in csv.DictReader(f)]
+    assert rows == [("a", "2024-01-03T10:00:00Z"), ("b", "2024-01-02T10:00:00Z"), ("c", "2024-01-03T11:00:00Z")]
+    assert delta_sync.load_state("D-1")["high_water"] == "2024-01-03T11:00:00Z"
+
+    # A listing that fails leaves the saved high-water mark where it was
+    def failed_listing(docket_id, modified_since=None):
+        raise RuntimeError("listing failed")
+    monkeypatch.setattr(newcommentbuilder, "get_comments_for_docket", failed_listing)
+    with pytest.raises(RuntimeError):
+        newcommentbuilder.sync_docket("D-1")
+    assert delta_sync.load_state("D-1")["high_water"] == "2024-01-03T11:00:00Z"
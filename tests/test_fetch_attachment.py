@@ -0,0 +1,36 @@
+import hashlib
+
+import pytest
+
+import newcommentbuilder
+
+PDF = b"%PDF-1.4 test body"
+
+
+class FakeResponse:
+    headers = {"Content-Type": "application/pdf"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield PDF
+
+
+@pytest.mark.parametrize("advertised_size", [None, "", "12 MB", "unknown", 1.5, "18"])
+def test_unusable_advertised_size_still_downloads(monkeypatch, advertised_size):
+    monkeypatch.setattr(newcommentbuilder, "http_get", lambda url, stream: FakeResponse())
+    payload, sha = newcommentbuilder.fetch_attachment("https://example.test/a.pdf", ".pdf", advertised_size)
+    assert payload == PDF and sha == hashlib.sha256(PDF).hexdigest()
+
+
+def test_oversized_advertised_size_is_skipped(monkeypatch):
+    monkeypatch.setattr(newcommentbuilder, "http_get", lambda url, stream: pytest.fail("downloaded"))
+    assert newcommentbuilder.fetch_attachment("https://example.test/a.pdf", ".pdf", "2048",
+                                              max_bytes=1024) == (None, None)
@@ -0,0 +1,40 @@
+import pytest
+
+from keypool import ApiKeyPool
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, **headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+def test_requests_are_spread_across_keys():
+    pool = ApiKeyPool(["a", "b"], burst=4)
+    keys = [pool.try_acquire()[0] for _ in range(8)]
+    assert sorted(keys) == ["a"] * 4 + ["b"] * 4
+    key, wait = pool.try_acquire()
+    assert key is None and wait > 0
+
+
+def test_reported_quota_and_bucket_tokens_are_ranked_alike():
+    pool = ApiKeyPool(["reported", "unreported"], burst=10)
+    assert [pool.try_acquire()[0] for _ in range(3)] == ["reported", "unreported", "reported"]
+    # A large reported quota must not outrank a key with more tokens in its bucket
+    pool.update_from_response("reported", FakeResponse(**{"X-RateLimit-Remaining": "900"}))
+    assert pool.try_acquire()[0] == "unreported"
+
+    pool.update_from_response("unreported", FakeResponse(**{"X-RateLimit-Remaining": "1"}))
+    assert pool.try_acquire()[0] == "reported"
+
+
+def test_rate_limited_key_is_rested():
+    pool = ApiKeyPool(["a", "b"])
+    pool.update_from_response("a", FakeResponse(429, **{"Retry-After": "30"}))
+    assert {pool.try_acquire()[0] for _ in range(5)} == {"b"}
+    assert pool.stats()["a"]["rate_limited"] == 1
+
+
+def test_empty_pool_is_rejected():
+    with pytest.raises(ValueError):
+        ApiKeyPool([])
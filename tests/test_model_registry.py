@@ -0,0 +1,26 @@
+import os
+
+from model_registry import ModelRegistry
+
+
+class StubClassifier:
+    def __init__(self, model_path):
+        self.model_path = model_path
+
+    def load_model(self):
+        with open(self.model_path) as f:
+            self.model = f.read()
+
+
+def test_get_returns_copy_with_its_model_version(tmp_path):
+    path = str(tmp_path / "model.pkl")
+    with open(path, "w") as f:
+        f.write("v1")
+    registry = ModelRegistry(lambda: StubClassifier(path), path, check_interval=float("inf"))
+
+    first, version = registry.get()
+    second, same_version = registry.get()
+
+    assert first is not second and first.model == second.model == "v1"
+    assert version == same_version == os.stat(path).st_mtime_ns
+    assert registry.loads == 1
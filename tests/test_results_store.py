@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import results_store
+from results_store import ResultsWriter, load_results, load_summary
+
+
+def _chunk(start, rows, substantive):
+    return pd.DataFrame({
+        'id': [f"C{i}" for i in range(start, start + rows)],
+        'comment': ["text " * (i % 7 + 1) for i in range(start, start + rows)],
+        'Substantive': [substantive] * rows,
+        'Confidence': [0.5 + (i % 5) / 10 for i in range(start, start + rows)],
+        'Comment_Length': [i % 300 for i in range(start, start + rows)],
+    })
+
+
+def test_writer_appends_several_chunks(tmp_path):
+    folder = str(tmp_path)
+    writer = ResultsWriter(folder)
+    writer.write(_chunk(0, 3, True))
+    writer.write(_chunk(3, 4, False))
+    writer.write(_chunk(7, 2, True))
+    summary = writer.close({'clusters': {'comments': 9}})
+
+    assert summary['total'] == 9
+    assert summary['substantive'] == 5
+    assert summary['clusters'] == {'comments': 9}
+    assert load_summary(folder)['version'] == summary['version']
+    results = load_results(folder)
+    assert list(results['id']) == [f"C{i}" for i in range(9)]
+    assert results['Substantive'].dtype == bool
+    assert len(pd.read_csv(os.path.join(folder, results_store.RESULTS_CSV))) == 9
+    assert not [name for name in os.listdir(folder) if name.endswith('.tmp')]
+
+
+def test_abort_keeps_previous_results(tmp_path):
+    folder = str(tmp_path)
+    writer = ResultsWriter(folder)
+    writer.write(_chunk(0, 3, True))
+    previous = writer.close()
+
+    writer = ResultsWriter(folder)
+    writer.write(_chunk(100, 5, False))
+    writer.write(_chunk(105, 5, False))
+    writer.abort()
+
+    assert load_summary(folder)['version'] == previous['version']
+    assert list(load_results(folder)['id']) == ['C0', 'C1', 'C2']
+    assert not [name for name in os.listdir(folder) if name.endswith('.tmp')]
@@ -0,0 +1,73 @@
+import csv
+
+from search_index import CommentSearchIndex
+
+
+def _index(tmp_path):
+    index = CommentSearchIndex(str(tmp_path / "search.sqlite"))
+    index.add_many("FSIS-1", [
+        {"id": "a", "title": "Benzoic acid", "comment": "Limit benzoic acid in <poultry> products."},
+        {"id": "b", "title": "Staffing", "comment": "Acid rain and benzoic preservatives are unrelated."},
+        {"id": "c", "title": "Line speeds", "comment": "Inspectors need slower line speeds."},
+    ])
+    return index
+
+
+def test_phrase_and_boolean_queries_are_ranked(tmp_path):
+    index = _index(tmp_path)
+    total, results = index.search("FSIS-1", '"benzoic acid"')
+    assert total == 1 and results[0]["id"] == "a"
+    assert index.search("FSIS-1", "benzoic")[0] == 2
+    # The title match ranks first
+    assert index.search("FSIS-1", "benzoic")[1][0]["id"] == "a"
+    assert index.search("FSIS-1", "benzoic NOT rain")[0] == 1
+    assert index.search("FSIS-1", "speeds OR rain")[0] == 2
+
+
+def test_snippets_are_escaped_and_highlighted(tmp_path):
+    index = _index(tmp_path)
+    snippet = index.search("FSIS-1", "poultry")[1][0]["snippet"]
+    assert "&lt;<mark>poultry</mark>&gt;" in snippet
+
+
+def test_invalid_syntax_is_matched_literally(tmp_path):
+    index = _index(tmp_path)
+    assert index.search("FSIS-1", 'benzoic "acid')[0] == 2
+
+
+def test_dockets_are_separate_and_rows_replaced(tmp_path):
+    index = _index(tmp_path)
+    index.add("upload:s1", {"id": "a", "title": "", "comment": "forged benzoic text"})
+    index.flush()
+    assert index.search("FSIS-1", "forged")[0] == 0
+    assert index.search("upload:s1", "benzoic")[0] == 1
+
+    index.add("FSIS-1", {"id": "a", "title": "Benzoic acid", "comment": "revised"})
+    index.flush()
+    assert index.search("FSIS-1", "limit")[0] == 0
+    index.clear("upload:s1")
+    assert index.search("upload:s1", "benzoic")[0] == 0
+    assert index.stats() == {"comments": 3, "dockets": 1}
+
+
+def test_add_csv_skips_indexed_ids(tmp_path):
+    index = _index(tmp_path)
+    path = tmp_path / "comments.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "title", "comment"])
+        writer.writeheader()
+        writer.writerow({"id": "a", "title": "", "comment": "should be skipped"})
+        writer.writerow({"id": "d", "title": "", "comment": "x" * 200000 + " sodium"})
+    index.add_csv("FSIS-1", str(path), skip_ids=index.indexed_ids("FSIS-1"))
+    assert index.search("FSIS-1", "skipped")[0] == 0
+    assert index.search("FSIS-1", "sodium")[0] == 1
+
+
+def test_prefix_near_and_paging(tmp_path):
+    index = _index(tmp_path)
+    assert index.search("FSIS-1", "preserv*")[1][0]["id"] == "b"
+    assert index.search("FSIS-1", "NEAR(slower speeds, 2)")[0] == 1
+    total, first = index.search("FSIS-1", "benzoic", limit=1)
+    _, second = index.search("FSIS-1", "benzoic", limit=1, offset=1)
+    assert total == 2 and [first[0]["id"], second[0]["id"]] == ["a", "b"]
+    assert first[0]["score"] >= second[0]["score"]
@@ -0,0 +1,43 @@
+import os
+
+from rule_cache import RuleFeatureCache
+
+
+def _pdf(tmp_path, name):
+    path = str(tmp_path / name)
+    with open(path, "wb") as f:
+        f.write(os.urandom(64))
+    return path
+
+
+def test_eviction_drops_least_recently_used_until_under_target(tmp_path):
+    cache = RuleFeatureCache(str(tmp_path / "rules.sqlite"), max_bytes=3000)
+    features = lambda path: os.urandom(900)
+    pdfs = [_pdf(tmp_path, f"rule{i}.pdf") for i in range(3)]
+    for path in pdfs:
+        cache.get_or_compute(path, features)
+    # Use the oldest entry again so the second one is now least recently used
+    cache.get_or_compute(pdfs[0], features)
+    cache.get_or_compute(_pdf(tmp_path, "rule3.pdf"), features)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 3000 * 0.9
+    assert stats["entries"] == 2
+    misses = cache.misses
+    cache.get_or_compute(pdfs[0], features)
+    assert cache.misses == misses
+    cache.get_or_compute(pdfs[1], features)
+    assert cache.misses == misses + 1
+    cache.close()
+
+
+def test_byte_total_survives_reopening(tmp_path):
+    path = str(tmp_path / "rules.sqlite")
+    cache = RuleFeatureCache(path)
+    cache.get_or_compute(_pdf(tmp_path, "rule.pdf"), lambda path: "features")
+    stored = cache.stats()["bytes"]
+    cache.close()
+
+    reopened = RuleFeatureCache(path)
+    assert reopened.stats()["bytes"] == stored > 0
+    reopened.close()
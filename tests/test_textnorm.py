@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+from textnorm import normalize_column, normalize_text
+
+
+def test_comparison_signs_are_not_tags():
+    text = 'Listeria levels < 100 CFU/g and > 10 CFU/g are fine'
+    assert normalize_text(text) == text
+
+
+def test_comment_markup_is_stripped():
+    assert normalize_text('<p>We <b>oppose</b> this&nbsp;rule</p>') == 'We oppose this rule'
+
+
+def test_plain_text_keeps_markup_like_content():
+    assert normalize_text('Use <b> & &amp; as written', markup=False) == 'Use <b> & &amp; as written'
+
+
+def test_tag_residue_and_entities():
+    text = "brbrspan style='padding-left: 30px'spanThank you &ldquo;FSIS&rdquo;brWe abbreviate abbr"
+    assert normalize_text(text) == "Thank you “FSIS”\nWe abbreviate abbr"
+
+
+def test_control_and_zero_width_characters_are_dropped():
+    assert normalize_text("café​\x00 costs\xa0rise\n\n\n\nend") == "café costs rise\n\nend"
+
+
+def test_pathological_input_stays_fast():
+    text = "<br" * 100000 + "br" * 200000
+    started = time.perf_counter()
+    normalize_text(text)
+    assert time.perf_counter() - started < 2
+
+
+def test_normalize_column_fills_missing_values():
+    pd = pytest.importorskip("pandas")
+    assert list(normalize_column(pd.Series(["<b>x</b>", None]))) == ["x", ""]
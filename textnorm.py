@@ -0,0 +1,71 @@
+"""Linear-time normalization of comment and attachment text
+
+normalize_text() replaces the old character-by-character clean_text. It
+removes HTML tags and the tag residue regulations.gov leaves in comment bodies
+(e.g. "brspan style='padding-left: 30px'span", "brThank you"), decodes
+entities such as &ldquo;, and drops control characters while keeping
+non-ASCII text. Markup handling applies only to HTML comment bodies;
+extracted attachment text is normalized with markup=False, so a "<" or ">"
+in a PDF (e.g. "< 100 CFU/g") is kept as written. Each step is a single compiled-regex or str.replace pass, so
+the cost grows linearly with input size.
+"""
+import html
+import re
+
+# Line-breaking tags become newlines, every other tag disappears; a
+# match stops at the next "<" so an unclosed "<br<br..." is scanned only once
+BREAK_TAG_RE = re.compile(r"<\s*(?:br|/p|/div|/li)\b[^<>]*>", re.IGNORECASE)
+# Only real tags: a bare "<" or ">" in prose ("levels < 100 and > 10") is text
+TAG_RE = re.compile(r"</?[A-Za-z][^<>]{0,2000}>")
+# Residue of tags whose angle brackets were already stripped upstream:
+# "brbrspan style='padding-left: 30px'span" and "br" glued to a capitalised word.
+# Both patterns start with a literal so the regex engine can skip ahead quickly,
+# and a run of "br" is only tried from its first "br", not again from each one.
+SPAN_RESIDUE_RE = re.compile(r"span style='[^']{0,200}'span")
+BR_RESIDUE_RE = re.compile(r"(?<!br)br(?:br)*(?=[A-Z\n])")
+BLANK_LINES_RE = re.compile(r"\n[ \t]*\n(?:[ \t]*\n)+")
+# C0/C1 control characters except tab, newline and carriage return, plus
+# zero-width characters that only confuse tokenizers
+CONTROL_CHARS_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f\u200b-\u200d\u2060\ufeff]")
+
+
+def _replace_br_residue(match):
+    # "br" at the end of a real word (e.g. "abbr") is left alone
+    start = match.start()
+    if start and match.string[start - 1].isalpha():
+        return match.group()
+    return "\n"
+
+
+def normalize_text(text, markup=True):
+    """Strip markup, decode entities and remove control characters
+
+    With markup=False (plain text such as extracted attachments) tags,
+    tag residue and entities are left alone.
+    """
+    if not text:
+        return ""
+    if not isinstance(text, str):
+        text = str(text)
+    if markup:
+        if "<" in text:
+            text = BREAK_TAG_RE.sub("\n", text)
+            text = TAG_RE.sub("", text)
+        if "span style=" in text:
+            text = SPAN_RESIDUE_RE.sub("\n", text)
+        text = BR_RESIDUE_RE.sub(_replace_br_residue, text)
+        if "&" in text:
+            text = html.unescape(text)
+    text = CONTROL_CHARS_RE.sub("", text).replace("\xa0", " ")
+    text = BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+def normalize_many(texts):
+    """Normalize an iterable of texts, returning a list"""
+    return [normalize_text(text) for text in texts]
+
+
+def normalize_column(series):
+    """Normalize a pandas Series of texts; missing values become empty strings"""
+    return series.fillna("").map(normalize_text)
@@ -0,0 +1,82 @@
+"""Shared HTTP transport for the regulations.gov client
+
+All API and attachment requests go through one requests.Session so TCP and TLS
+connections are kept alive and reused instead of being opened per call.
+transport_stats() reports how many connections were opened versus how many
+requests were sent, which shows whether reuse is actually happening.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Number of hosts to keep connection pools for (API host plus download hosts)
+POOL_CONNECTIONS = 4
+# Connections kept open per host; should be at least the fetch concurrency
+POOL_MAXSIZE = 32
+# (connect, read) timeout in seconds for every request
+REQUEST_TIMEOUT = (10, 60)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session(pool_connections, pool_maxsize):
+    session = requests.Session()
+    # pool_block makes extra threads wait for a free connection rather than
+    # opening throwaway ones that are discarded after a single request
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                          pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+def configure_transport(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    """Replace the shared session with one using the given pool sizes"""
+    global _session
+    with _session_lock:
+        old_session = _session
+        _session = _build_session(pool_connections, pool_maxsize)
+    if old_session is not None:
+        old_session.close()
+    return _session
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(POOL_CONNECTIONS, POOL_MAXSIZE)
+    return _session
+
+
+def http_get(url, **kwargs):
+    """GET through the shared session with the default timeout"""
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    return get_session().get(url, **kwargs)
+
+
+def transport_stats():
+    """Connection reuse counters summed over the session's live connection pools"""
+    session = _session
+    stats = {"requests": 0, "connections_opened": 0, "connections_reused": 0, "hosts": 0}
+    if session is None:
+        return stats
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats["hosts"] += 1
+            stats["requests"] += pool.num_requests
+            stats["connections_opened"] += pool.num_connections
+    stats["connections_reused"] = max(0, stats["requests"] - stats["connections_opened"])
+    return stats